@@ -2,9 +2,14 @@
 A module for testing parameters of the gas and producing plots
 """
 #%% importing modules
+import time
+import numpy
 import matplotlib.pyplot as plt
 import scipy as sp
 from thermodynamic_simulation import Simulation
+from thermodynamic_sweep import sweep, column
+from thermodynamic_ensemble import Ensemble
+from thermodynamic_io import save_results, load_results
 #%% #Parameters for plotting graphs
 params = {
             'axes.labelsize': 24,
@@ -38,8 +43,93 @@ for i in range(0, len(Molecules_stds)):
     stds_pressure.append(Molecules_stds[i].pressure())
     stds_temperature.append(Molecules_stds[i]._temperature[-1])
 
+#%% Task 11, the same temperature sweep with each simulation in its own process
+#Much faster than the block above on a machine with several cores, gives stds_pressure and
+#stds_temperature for the same temperatures, but not the same values: each case gets its own 
+#seed drawn from seed=1 while the block above uses numpy's global random numbers 
+#(the seed makes the sweep itself reproducible)
+#the sweep forks its worker processes (see mp_context of sweep), so they don't import this file
+#this and the other sweep cells only work where there is fork (Linux and macOS): on Windows every 
+#worker would import this file and run every cell that isn't under if __name__ == '__main__'
+if __name__ == '__main__':
+    stds_results = sweep({'mass': [1.0], 'radius': [1.0], 'numberofballs': [100], \
+                          'containerradius': [20.0], 'sigma': stds}, 1000, seed=1)
+    stds_pressure = column(stds_results, 'pressure')
+    stds_temperature = column(stds_results, 'temperature')
 
+#%% Task 11, the temperature sweep with every pressure measured to the same precision
+#A fixed number of collisions covers a much longer time for the cold gases than the hot ones, 
+#so instead each simulation runs until its pressure on the container, measured every 2 seconds, 
+#is known to within 2% (or for 10000 seconds at most)
+#stds_pressure stays the mean pressure of each collision (Simulation.pressure) like the other
+#figures of the equation of state, the pressure on the container over time (wall_pressure), 
+#a different measure of the pressure, is kept apart in stds_wall_pressure and plotted below
+if __name__ == '__main__':
+    stds_results = sweep({'mass': [1.0], 'radius': [1.0], 'numberofballs': [100], \
+                          'containerradius': [20.0], 'sigma': stds}, t_end=1e4, \
+                         sample_interval=2.0, tol=0.02, seed=1)
+    stds_pressure = column(stds_results, 'pressure')
+    stds_temperature = column(stds_results, 'temperature')
+    stds_wall_pressure = column(stds_results, 'wall_pressure')
+    stds_wall_pressure_error = column(stds_results, 'wall_pressure_error')
+    print("Collisions needed:", column(stds_results, 'collisions'))
 
+#%% The pressure on the container over time against temperature
+#not comparable with the pressures of figures 5, 6 and 8, which are means over the collisions
+if __name__ == '__main__':
+    plt.errorbar(stds_temperature, stds_wall_pressure, yerr=stds_wall_pressure_error, fmt='o')
+    plt.title("Pressure on the container against Temperature")
+    plt.xlabel("Temperature (K)")
+    plt.ylabel("Pressure (Pa)")
+    plt.show()
+
+#%% Saving the temperature sweep to a results file
+#so the fits of figures 5 and 8 can be made again later without running the sweep
+if __name__ == '__main__':
+    save_results(stds_results, "temperature_sweep.npz")
+
+#%% Sampling the gas at fixed times rather than at every collision
+Timed = Simulation(1.0, 1.0, 100, 20.0, seed=1)
+samples = Timed.run_until(50.0, sample_interval=0.5)
+plt.plot(samples.t, samples.wall_pressure, label='Over each 0.5 s')
+plt.plot(samples.t, samples.pressure, label='Running mean of each collision')
+plt.legend()
+plt.title("Pressure of the gas")
+plt.xlabel("Time (s)")
+plt.ylabel("Pressure (Pa)")
+plt.show()
+
+
+
+#%% Task 12, replicas of the temperature sweep run together as one Ensemble
+#4 replicas of each temperature, which gives an error on the gradient of Fig. 5
+Replicas = Ensemble(20, 1.0, 1.0, 100, 20.0, \
+                    sigma=[std for std in stds for replica in range(4)], seed=1)
+Replicas.run(1000)
+gradient, intercept, gradient_error, intercept_error = \
+    Replicas.pressure_temperature_fit()
+print("Gradient: %s +/- %s" %(gradient, gradient_error))
+
+#%% Checking the compiled backend against the reference one
+#The same seed gives the same collisions until rounding differences grow (the gas is chaotic),
+#so the first collisions and the pressure should agree (needs numba for the compiled backend)
+#test_backends.py checks this for every engine: python -m pytest test_backends.py
+Reference = Simulation(1.0, 1.0, 100, 20.0, seed=1)
+Compiled = Simulation(1.0, 1.0, 100, 20.0, seed=1, backend='compiled')
+Reference.run(1000)
+Compiled.run(1000)
+print("Same first 200 collision times:", \
+      numpy.allclose(Reference._t_list[:200], Compiled._t_list[:200], rtol=1e-6))
+print("Pressure: %s (reference) %s (compiled)" %(Reference.pressure(), Compiled.pressure()))
+
+#%% Predicting the first collisions of a very large gas with several threads
+#The queue of predicted collisions is the same whatever the number of threads, only the start up is faster
+for threads in [1, None]:
+    start = time.perf_counter()
+    Large = Simulation(1.0, 1.0, 20000, 200.0, seed=1, spatial_index=True, \
+                       backend='compiled', threads=threads)
+    print("threads=%s: %.3g s to start, %s events" %(threads, time.perf_counter() - start, \
+                                                    len(Large._events)))
 
 #%% Task 11 Testing how the volume of the container affects the simulation
 #Does not need to be run
@@ -98,6 +188,15 @@ Sim.kinetic_energy_conservation()
 #%% Task 11 Fig 4
 Sim.momentum_conservation()
 
+#%% Reading the temperature sweep back from its results file (instead of running it again)
+#only the summary of each run is read, a time series (saved with keep_series=True) is only
+#read when asked for with Saved.series(run, name) or in pieces with Saved.chunks(run, name)
+with load_results("temperature_sweep.npz") as Saved:
+    stds_temperature = Saved.column('temperature')
+    stds_pressure = Saved.column('pressure') #the same measure of the pressure as figure 6
+    if 'wall_pressure' in Saved.names():
+        stds_wall_pressure = Saved.column('wall_pressure')
+
 #%% Task 12 Fig. 5
 TempPressLine = sp.polyfit(stds_temperature, stds_pressure, 1)
 x = sp.linspace(0, max(stds_temperature), 1000)
@@ -133,6 +232,14 @@ for i in range(0, len(radius_stds)):
         radius_stds_pressure[i].append(Molecules_radius_stds[i][j].pressure())
         radius_stds_temperature[i].append( \
             Molecules_radius_stds[i][j]._temperature[-1])
+#saving the 9 simulations so figure 6 can be made again from the file
+save_results(sum(Molecules_radius_stds, []), "radius_sweep.npz")
+
+#%% Reading the simulations of figure 6 back from their results file
+with load_results("radius_sweep.npz") as Saved:
+    radii = Saved.column('radius')
+    radius_stds_pressure = [Saved.column('pressure')[radii == r] for r in radius_stds]
+    radius_stds_temperature = [Saved.column('temperature')[radii == r] for r in radius_stds]
 
 #%% Task 12 Fig 6
 radius_stds_line0 = sp.polyfit(radius_stds_temperature[0], \
@@ -186,3 +293,11 @@ plt.ylabel("Pressure (Pa)" )
 plt.legend()
 #plt.savefig("Fig.8.png") #a command to save the figure
 plt.show()
+
+#%% A mixture of two species, 150 small light balls and 50 large heavy ones
+#the two species share their energy until they have the same temperature
+Mixture = Simulation([1.0, 4.0], [0.5, 1.0], [150, 50], 30.0, sigma=[20, 10], \
+                     seed=1, spatial_index=True)
+Mixture.run(20000)
+print("Temperature of each species:", Mixture.temperatures())
+print("Partial pressure of each species:", Mixture.partial_pressures())
@@ -0,0 +1,45 @@
+"""
+Tests that the compiled backend gives the same simulation as the reference one for the same seed
+Run with: python -m pytest test_backends.py
+"""
+
+import numpy
+import pytest
+
+from thermodynamic_simulation import Simulation
+
+pytest.importorskip('numba')
+
+#the cases compared, the scan engine is the only one that uses the scan kernel
+CASES = [dict(), dict(spatial_index=True), dict(lazy=True, spatial_index=True), \
+         dict(engine='scan')]
+
+def pair(seed, **arguments):
+    #a function that returns a reference and a compiled simulation made with the same seed
+    reference = Simulation(1.0, 1.0, 40, 20.0, seed=seed, **arguments)
+    compiled = Simulation(1.0, 1.0, 40, 20.0, seed=seed, backend='compiled', **arguments)
+    assert compiled._backend == 'compiled'
+    return reference, compiled
+
+@pytest.mark.parametrize('arguments', CASES)
+@pytest.mark.parametrize('seed', [1, 2])
+def test_same_collision_times(seed, arguments):
+    #the first 200 collisions happen at the same times, rounding differences between the
+    #backends grow by about ten times every 20 collisions (the gas is chaotic) so by the 200th 
+    #collision the times only agree to about 1e-9
+    reference, compiled = pair(seed, **arguments)
+    reference.run(200)
+    compiled.run(200)
+    assert numpy.allclose(numpy.array(reference._t_list), numpy.array(compiled._t_list), \
+                          rtol=1e-6, atol=0.0)
+
+@pytest.mark.parametrize('arguments', CASES)
+def test_same_velocities(arguments):
+    #after a few collisions every ball has the same velocity
+    reference, compiled = pair(3, **arguments)
+    reference.run(20)
+    compiled.run(20)
+    assert numpy.allclose(reference._store.velocities, compiled._store.velocities, \
+                          rtol=1e-9, atol=1e-12)
+    assert numpy.allclose(reference._store.current_positions(), \
+                          compiled._store.current_positions(), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,41 @@
+"""
+Tests that the event engine gives the same simulation as the scan of every pair for the same seed
+Run with: python -m pytest test_engines.py
+"""
+
+import numpy
+import pytest
+
+from thermodynamic_simulation import Simulation
+
+#the ways of running the event engine that give exactly the collisions of the scan
+CASES = [dict(), dict(spatial_index=True)]
+MASSES = [1e2, 1e4, 1e20]
+
+def pair(containermass, **arguments):
+    #a function that returns a scan and an event simulation made with the same seed
+    scan = Simulation(1.0, 1.0, 30, 15.0, containermass=containermass, seed=0, engine='scan')
+    event = Simulation(1.0, 1.0, 30, 15.0, containermass=containermass, seed=0, **arguments)
+    return scan, event
+
+@pytest.mark.parametrize('arguments', CASES)
+@pytest.mark.parametrize('containermass', MASSES)
+def test_same_as_scan(containermass, arguments):
+    #the same collision times and pressure as the scan, also for a container light enough
+    #to be moved by the balls
+    scan, event = pair(containermass, **arguments)
+    scan.run(300)
+    event.run(300)
+    assert numpy.array_equal(numpy.array(scan._t_list), numpy.array(event._t_list))
+    assert scan.pressure() == event.pressure()
+    assert numpy.array_equal(scan._store.velocities, event._store.velocities)
+
+@pytest.mark.parametrize('containermass', MASSES)
+def test_lazy_close_to_scan(containermass):
+    #lazy mode moves each ball from the time it was last moved, which rounds differently,
+    #so its first 100 collisions agree with the scan to within 1e-9 rather than exactly
+    scan, event = pair(containermass, lazy=True, spatial_index=True)
+    scan.run(100)
+    event.run(100)
+    assert numpy.allclose(numpy.array(scan._t_list), numpy.array(event._t_list), \
+                          rtol=1e-9, atol=0.0)
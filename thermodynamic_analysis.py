@@ -0,0 +1,75 @@
+"""
+A module for analysing the positions of the balls of a simulation without Python loops over pairs
+"""
+
+import numpy
+
+from thermodynamic_observers import Observer
+
+def pair_distance_histogram(positions, bins, chunk=None):
+    #a function for counting the distances between every pair of the given positions (N,2) in the given bins
+    #the pairs are worked through in blocks of rows, so the full list of distances is never made
+    #chunk is the number of rows per block, by default enough for about 4 million distances
+    #returns the counts of each unordered pair (i<j)
+    positions = numpy.asarray(positions, dtype=float)
+    N = len(positions)
+    if chunk is None:
+        chunk = max(1, 4000000//max(N, 1))
+    counts = numpy.zeros(len(bins) - 1, dtype=numpy.int64)
+    for start in range(0, N, chunk):
+        stop = min(start + chunk, N)
+        #distances from the rows of this block to every later ball
+        difference = positions[start:stop, None] - positions[None, start + 1:]
+        distances = numpy.sqrt(numpy.einsum('ijk,ijk->ij', difference, difference))
+        later = numpy.arange(start + 1, N)[None, :] > numpy.arange(start, stop)[:, None]
+        counts += numpy.histogram(distances[later], bins)[0]
+    return counts
+
+def disc_pair_distribution(r, a):
+    #a function that returns the probability density of the distance r between two points
+    #placed uniformly at random in a disc of radius a (the result for an ideal gas)
+    x = numpy.clip(numpy.asarray(r, dtype=float)/(2*a), 0.0, 1.0)
+    return (4*numpy.asarray(r, dtype=float)/(numpy.pi*a**2))* \
+        (numpy.arccos(x) - x*numpy.sqrt(1 - x**2))
+
+class RadialDistribution(Observer):
+    """
+    A Class derived from Observer for the radial distribution function g(r) of the balls
+    The pair distances of many snapshots are added into fixed bins, and compared with the
+    distances of points spread uniformly over the disc the centres of the balls can reach,
+    so an ideal gas gives g(r)=1 with no correction needed for the edge of the container
+    Fed to a simulation it takes a snapshot every given number of collisions
+    """
+    def __init__(self, containerradius, radius, bins=200, every=100):
+        #initialing parameters of the distribution
+        self._a = containerradius - radius #radius of the disc the centres of the balls can reach
+        self.bins = numpy.linspace(0.0, 2*self._a, bins + 1)
+        self.counts = numpy.zeros(bins, dtype=numpy.int64)
+        self._pairs = 0 #number of pairs counted over all snapshots
+        self._every = every
+        self._count = 0
+        self.snapshots = 0
+
+    def sample(self, positions):
+        #a function for adding the pair distances of a snapshot of the positions of the balls
+        self.counts += pair_distance_histogram(positions, self.bins)
+        self._pairs += len(positions)*(len(positions) - 1)//2
+        self.snapshots += 1
+
+    def update(self, event, simulation):
+        #a function for taking a snapshot every every-th collision
+        self._count += 1
+        if self._count % self._every == 0:
+            store = simulation._store
+            self.sample(store.current_positions()[~store.is_container])
+
+    def g(self):
+        #a function that returns (centres of the bins, g(r))
+        centres = 0.5*(self.bins[1:] + self.bins[:-1])
+        #integrating the ideal distribution over each bin with the midpoints of 16 slices
+        slices = self.bins[:-1, None] + (numpy.arange(16) + 0.5)[None, :]* \
+            (numpy.diff(self.bins)/16)[:, None]
+        ideal = self._pairs*numpy.mean(disc_pair_distribution(slices, self._a), \
+                                       axis=1)*numpy.diff(self.bins)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return centres, numpy.where(ideal > 0.0, self.counts/ideal, numpy.nan)
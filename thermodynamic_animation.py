@@ -0,0 +1,101 @@
+"""
+A module for the Renderer class, which animates a simulation
+"""
+
+import numpy
+from matplotlib.animation import FuncAnimation
+from matplotlib.collections import EllipseCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
+
+class Renderer():
+    """
+    A Class for animating a simulation
+    All the balls are drawn as one EllipseCollection whose offsets are updated from the
+    positions of the balls, and only the balls and the time are redrawn each frame (blitting)
+    Frames are spaced by a fixed time dt of the simulation rather than one per collision,
+    by default the time a ball at the rms speed takes to move a quarter of its radius
+    offscreen=True draws on a figure without a window, for saving videos or images
+    """
+    def __init__(self, simulation, dt=None, offscreen=False):
+        #initialing parameters of the renderer
+        self._sim = simulation
+        store = simulation._store
+        balls = numpy.arange(len(store))[~store.is_container]
+        self._balls = balls
+        if dt is None:
+            speed = numpy.sqrt(numpy.mean(numpy.einsum('ij,ij->i', \
+                store.velocities[balls], store.velocities[balls])))
+            dt = 0.25*numpy.min(store.radii[balls])/speed if speed > 0.0 else 1.0
+        self._dt = dt
+
+        #creating the figure, with the container drawn once and the balls as one collection
+        if offscreen:
+            self._figure = Figure()
+        else:
+            import matplotlib.pyplot as plt
+            self._figure = plt.figure()
+        R = simulation._container._R
+        self._ax = self._figure.add_subplot(xlim=(-R, R), ylim=(-R, R), aspect='equal')
+        self._ax.add_patch(Circle(simulation._container.pos(), R, \
+                                  **simulation._container._patch_style))
+        diameters = 2*store.radii[balls]
+        self._collection = EllipseCollection(diameters, diameters, 0.0, units='xy', \
+            offsets=store.current_positions(balls), \
+            offset_transform=self._ax.transData, facecolors='r', \
+            edgecolors='black', animated=True)
+        self._ax.add_collection(self._collection)
+        self._time = self._ax.text(0.02, 0.95, "", transform=self._ax.transAxes, \
+                                   animated=True)
+
+    def _draw(self):
+        #a function for updating the artists to the current positions and time
+        self._collection.set_offsets(self._sim._store.current_positions(self._balls))
+        self._time.set_text("Time=%.4g" %(self._sim._t))
+        return self._collection, self._time
+
+    def _frames(self, collisions=None, frames=None):
+        #a generator moving the simulation on by dt for each frame, stopping after the
+        #given number of collisions or frames (it runs forever if neither is given)
+        done = 0
+        frame = 0
+        start = self._sim._t
+        while (collisions is None or done < collisions) and \
+                (frames is None or frame < frames):
+            frame += 1
+            left = None if collisions is None else collisions - done
+            done += self._sim.advance_to(start + frame*self._dt, left)
+            yield frame
+
+    def animation(self, collisions=None, frames=None, fps=30):
+        #a function that returns the matplotlib animation of the simulation
+        self._generator = self._frames(collisions, frames)
+        return FuncAnimation(self._figure, lambda frame: self._draw(), \
+                             self._generator, init_func=self._draw, \
+                             blit=True, interval=1000.0/fps, repeat=False, \
+                             cache_frame_data=False)
+
+    def show(self, collisions=None, frames=None, fps=30):
+        #a function for showing the animation in a window until the given number of
+        #collisions or frames have happened
+        import matplotlib.pyplot as plt
+        self._anim = self.animation(collisions, frames, fps) #kept so it is not garbage collected
+        plt.show()
+        if collisions is not None: #finishing the collisions if the window was closed early
+            for frame in self._generator:
+                pass
+
+    def save(self, path, frames, fps=30, dpi=100):
+        #a function for writing the given number of frames to a video (e.g. 'gas.mp4', 'gas.gif')
+        #or to a sequence of images if path has a number format in it (e.g. 'frame%04d.png')
+        if '%' in path:
+            artists = self._draw()
+            for artist in artists: #drawn by savefig rather than blitted
+                artist.set_animated(False)
+            for frame in self._frames(frames=frames):
+                self._draw()
+                self._figure.savefig(path %frame, dpi=dpi)
+            for artist in artists:
+                artist.set_animated(True)
+            return
+        self.animation(frames=frames, fps=fps).save(path, fps=fps, dpi=dpi)
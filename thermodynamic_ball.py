@@ -3,26 +3,98 @@ A module for the class Ball and its derived class Container
 """
 
 import numpy
-import scipy as sp
-import matplotlib.pyplot as plt
+
+from thermodynamic_particles import ParticleStore
 
 class Ball():
     """
     A Class for creating Ball objects that will work as a molecule in a gas
+    The state of the ball is kept in a row of a ParticleStore, either one shared 
+    with the other balls of a simulation or a store of its own
+    The visual patch of the ball is only created (and matplotlib imported) when it is first used
     """
     def __init__(self, mass=10.0, radius=1.0, position=[3.0, 4.0], \
-                 velocity=[1.0, 0.0]):
+                 velocity=[1.0, 0.0], store=None, index=0):
         #initialing parameters of the ball
+        if store is None: #a ball on its own gets a store of one ball
+            store = ParticleStore(1)
+            index = 0
+        self._store = store
+        self._index = index
         self._m = mass 
         self._R = radius
-        self._r = sp.array(position)
-        self._v = sp.array(velocity)
-        self.patch = plt.Circle(self._r, self._R, fc='r', ec='black') #visual patch of ball
+        self._r = numpy.array(position)
+        self._v = numpy.array(velocity)
+        self._patch = None #visual patch of ball, created when it is first drawn
+        self._patch_style = dict(fc='r', ec='black')
         self.isContainer = False
         self.bounce_time = 0.0 #used for calculating pressure
+    
+    @property
+    def patch(self):
+        #the visual patch of the ball, following its position in the store
+        if self._patch is None:
+            from matplotlib.patches import Circle
+            self._patch = Circle(self._r, self._R, **self._patch_style)
+        return self._patch
+    
+    @patch.setter
+    def patch(self, value):
+        self._patch = value
+    
+    #the hidden variables of the ball are views into its row of the store
+    @property
+    def _r(self):
+        return self._store.positions[self._index]
+    
+    @_r.setter
+    def _r(self, value):
+        self._store.positions[self._index] = value
+    
+    @property
+    def _v(self):
+        return self._store.velocities[self._index]
+    
+    @_v.setter
+    def _v(self, value):
+        self._store.velocities[self._index] = value
+    
+    @property
+    def _m(self):
+        return self._store.masses[self._index]
+    
+    @_m.setter
+    def _m(self, value):
+        self._store.masses[self._index] = value
+    
+    @property
+    def _R(self):
+        return self._store.radii[self._index]
+    
+    @_R.setter
+    def _R(self, value):
+        self._store.radii[self._index] = value
+    
+    @property
+    def bounce_time(self):
+        return self._store.bounce_times[self._index]
+    
+    @bounce_time.setter
+    def bounce_time(self, value):
+        self._store.bounce_times[self._index] = value
+    
+    @property
+    def isContainer(self):
+        return bool(self._store.is_container[self._index])
+    
+    @isContainer.setter
+    def isContainer(self, value):
+        self._store.is_container[self._index] = value
         
     def pos(self): 
         #a function for obtaining the hidden variable of the position of the particle
+        #the stored position is first brought up to the time of its store
+        self._store.sync(self._index)
         return self._r
     
     def vel(self): 
@@ -41,33 +113,44 @@ class Ball():
             R_relative = self._R - other._R
         else:
             R_relative = self._R + other._R
-        dotrr = sp.dot(r_relative, r_relative)
-        dotrv = sp.dot(r_relative, v_relative)
-        dotvv = sp.dot(v_relative, v_relative)
+        dotrr = numpy.dot(r_relative, r_relative)
+        dotrv = numpy.dot(r_relative, v_relative)
+        dotvv = numpy.dot(v_relative, v_relative)
+        #the balls touch when v.v δt^2 + 2 r.v δt + (r.r-R^2) = 0, 
         #δt=(-v.r±sqrt((r.v)^2-v.v*(r.r-R^2)))/v.v
-        deltatplus = (-dotrv + sp.sqrt(dotrv**2 - \
-            dotvv*(dotrr - R_relative**2)))/(dotvv)
-        #δt=(-v.r±sqrt((r.v)^2-v.v*(r.r-R^2)))/v.v
-        deltatminus = (-dotrv - sp.sqrt(dotrv**2 - \
-            dotvv*(dotrr - R_relative**2)))/(dotvv)  
-        if deltatminus > 1e-14 and type(deltatminus) != numpy.complex128:
-            return deltatminus  #return the smallest change in time given that it is positive and real
-        elif deltatplus > 0.0 and type(deltatplus) != numpy.complex128:
-            return deltatplus #return the change in time given that it is positive and real
-        else: 
-            return 1e10 #returning a large number as in next_collision the smallest 
-                        #change in time is being looked for
+        c = dotrr - R_relative*R_relative
+        discriminant = dotrv*dotrv - dotvv*c
+        if self.isContainer or other.isContainer:
+            #a ball hits the container from the inside, at the larger root
+            if dotrv > 0.0: #moving towards the wall
+                if c < 0.0:
+                    return -c/(dotrv + numpy.sqrt(discriminant)) #the larger root without cancellation
+                return 0.0 #already past the wall and still moving out, so it bounces straight away
+            if dotvv > 0.0 and discriminant >= 0.0:
+                return (numpy.sqrt(discriminant) - dotrv)/dotvv
+            return numpy.inf
+        #two balls only meet if they are approaching (r.v<0), at the smaller root
+        if dotrv >= 0.0 or discriminant < 0.0:
+            return numpy.inf #returning infinity as in next_collision the smallest time is being looked for
+        if c <= 0.0:
+            return 0.0 #already overlapping and still approaching, so they bounce straight away
+        return c/(numpy.sqrt(discriminant) - dotrv) #the smaller root without cancellation
+        
+    def times_to_collision(self, others=None): 
+        #a function for determining the time until this ball collides with each of the 
+        #given balls of its store, all in one vectorised call
+        return self._store.times_to_collision(self._index, others)
         
     def collide(self, other): 
         #a function to cause the changes that the collision would change
         r_relative = (self._r - other._r)
-        r_relative_norm = r_relative/sp.sqrt(sp.dot(r_relative, r_relative)) 
-        r_relative_perp_norm = sp.array([-r_relative_norm[1], \
+        r_relative_norm = r_relative/numpy.sqrt(numpy.dot(r_relative, r_relative)) 
+        r_relative_perp_norm = numpy.array([-r_relative_norm[1], \
             r_relative_norm[0]])
-        self.v_parr = sp.dot(self._v, r_relative_norm)
-        self.v_perp = sp.dot(self._v, r_relative_perp_norm)
-        other.v_parr = sp.dot(other._v, r_relative_norm)
-        other.v_perp = sp.dot(other._v, r_relative_perp_norm)
+        self.v_parr = numpy.dot(self._v, r_relative_norm)
+        self.v_perp = numpy.dot(self._v, r_relative_perp_norm)
+        other.v_parr = numpy.dot(other._v, r_relative_norm)
+        other.v_perp = numpy.dot(other._v, r_relative_perp_norm)
         self.k_initial = self.kinetic_energy() #used for checking Energy conservation
         other.k_initial = other.kinetic_energy()
         self.momentum_inital = self.linear_momentum() #used for calculating pressure
@@ -89,7 +172,7 @@ class Ball():
                 
     def kinetic_energy(self): 
         #a function that returns the kinetic energy of a ball
-        return 0.5*self._m*sp.dot(self._v, self._v)
+        return 0.5*self._m*numpy.dot(self._v, self._v)
        
     def linear_momentum(self): 
         #a function that returns the linear momentum of a ball
@@ -99,11 +182,11 @@ class Container(Ball):
     """
     A Class derived from Ball for creating the container object that will work as the container of the gas
     """
-    def __init__(self, m=100000.0, r=10.0): 
+    def __init__(self, m=100000.0, r=10.0, store=None, index=0): 
         #initialing parameters of the container
         Ball.__init__(self, mass=m, radius=r , position=[0.0, 0.0], \
-                      velocity=[0.0, 0.0])
-        self.patch = plt.Circle(self._r, self._R, ec='b', fc='None') #visual patch of container
+                      velocity=[0.0, 0.0], store=store, index=index)
+        self._patch_style = dict(ec='b', fc='None') #visual patch of container
         self.isContainer = True
         self._pressuretime = 0.0
         
@@ -111,8 +194,8 @@ class Container(Ball):
         #used for calculating pressure
         self.delta_linear_momentum = other.linear_momentum() - \
                 other.momentum_inital
-        self._pressuretime = sp.sqrt(sp.dot(self.delta_linear_momentum, \
-                                self.delta_linear_momentum))/(2*sp.pi*self._R)
+        self._pressuretime = numpy.sqrt(numpy.dot(self.delta_linear_momentum, \
+                                self.delta_linear_momentum))/(2*numpy.pi*self._R)
           
         
-            
\ No newline at end of file
+            
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+A module for timing simulations over a grid of parameters and reporting how the cost
+of a collision scales with the number of balls
+It can be run as a script, which writes the report as JSON so later runs can be compared:
+python thermodynamic_benchmark.py --numberofballs 50 100 200 400 --output bench.json
+python thermodynamic_benchmark.py --baseline bench.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+from thermodynamic_simulation import Simulation
+from thermodynamic_sweep import parameter_grid
+
+#the grid timed when none is given, a dilute gas of growing size
+DEFAULT_GRID = dict(numberofballs=[50, 100, 200, 400, 800], containerradius=[60.0], \
+                    radius=[1.0], sigma=[20])
+
+#the columns of a row that are measured rather than parameters of the simulation
+TIMINGS = ('collisions', 'construct', 'run', 'time_per_event', \
+           'collisions_per_second', 'peak_memory')
+
+#the columns whose scaling with the number of balls is fitted, and how they are printed
+SCALED = (('time_per_event', 'time per collision'), \
+          ('collisions_per_second', 'collisions per second'), ('peak_memory', 'peak memory'))
+
+def time_case(parameters, num_frames, seed=1, repeat=3, memory=True):
+    #a function for timing the construction of a simulation and a run of num_frames collisions
+    #the best of repeat runs is kept, after one short run to warm up (e.g. compile kernels)
+    #memory=True also measures the peak memory of a separate run with tracemalloc,
+    #which is left out of the timed runs as it slows them down
+    #returns a row of the report, with an error instead of the timings if the case failed
+    row = dict(parameters)
+    try:
+        Simulation(seed=seed, **parameters).run(min(num_frames, 10))
+        construct = []
+        run = []
+        for repetition in range(repeat):
+            start = time.perf_counter()
+            sim = Simulation(seed=seed, **parameters)
+            built = time.perf_counter()
+            sim.run(num_frames)
+            construct.append(built - start)
+            run.append(time.perf_counter() - built)
+    except Exception as error: #e.g. the balls don't fit in the container
+        row['error'] = "%s: %s" %(type(error).__name__, error)
+        return row
+    row['collisions'] = num_frames
+    row['construct'] = min(construct)
+    row['run'] = min(run)
+    row['time_per_event'] = min(run)/num_frames
+    row['collisions_per_second'] = num_frames/min(run) if min(run) > 0.0 else numpy.inf
+    if memory:
+        tracemalloc.start()
+        Simulation(seed=seed, **parameters).run(num_frames)
+        row['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return row
+
+def scaling(results, x='numberofballs', y='time_per_event'):
+    #a function for fitting y = prefactor*x**exponent to the results of each set of the other parameters
+    #returns a list with one row per set: the other parameters, exponent, prefactor and the number of points
+    groups = {}
+    for row in results:
+        if 'error' in row or y not in row or not 0.0 < row[y] < numpy.inf:
+            continue
+        key = tuple(sorted((name, value) for name, value in row.items() \
+                           if name not in (x, 'error') and name not in TIMINGS))
+        groups.setdefault(key, []).append((row[x], row[y]))
+    fits = []
+    for key, points in groups.items():
+        if len(set(point[0] for point in points)) < 2:
+            continue
+        logs = numpy.log(numpy.array(points, dtype=float))
+        exponent, intercept = numpy.polyfit(logs[:, 0], logs[:, 1], 1)
+        fit = dict(key)
+        fit.update(x=x, y=y, exponent=float(exponent), \
+                   prefactor=float(numpy.exp(intercept)), points=len(points))
+        fits.append(fit)
+    return fits
+
+def machine():
+    #a function that returns a description of the machine and libraries the benchmark ran on
+    description = dict(python=platform.python_version(), numpy=numpy.__version__, \
+                       platform=platform.platform(), processor=platform.processor(), \
+                       date=time.strftime('%Y-%m-%d %H:%M:%S'))
+    try:
+        import numba
+        description['numba'] = numba.__version__
+    except ImportError:
+        description['numba'] = None
+    return description
+
+def benchmark(grid=None, num_frames=1000, seed=1, repeat=3, memory=True, verbose=False):
+    #a function for timing every case of grid (a list of keyword arguments of Simulation,
+    #or a dictionary of lists of values expanded with parameter_grid) one after another
+    #returns the report, a dictionary of the machine, the settings, the results table and
+    #the scaling with the number of balls of each column of SCALED (those measured)
+    if grid is None:
+        grid = DEFAULT_GRID
+    if isinstance(grid, dict):
+        grid = parameter_grid(**grid)
+    results = []
+    for parameters in grid:
+        row = time_case(parameters, num_frames, seed, repeat, memory)
+        results.append(row)
+        if verbose:
+            print(format_row(row))
+    return dict(machine=machine(), num_frames=num_frames, seed=seed, repeat=repeat, \
+                results=results, scaling=[fit for y, name in SCALED \
+                                          for fit in scaling(results, y=y)])
+
+def format_row(row):
+    #a function that returns a row of the results table as a line of text
+    parameters = " ".join("%s=%s" %(name, value) for name, value in row.items() \
+                          if name not in TIMINGS and name != 'error')
+    if 'error' in row:
+        return "%s  failed (%s)" %(parameters, row['error'])
+    line = "%s  %.3g collisions/s  %.3g s/collision  construct %.3g s" \
+        %(parameters, row['collisions_per_second'], row['time_per_event'], row['construct'])
+    if 'peak_memory' in row:
+        line += "  peak %.3g MB" %(row['peak_memory']/1e6)
+    return line
+
+def compare(report, baseline, tolerance=1.25):
+    #a function for finding the cases that are slower than in a baseline report
+    #a case is a regression if its time per collision is more than tolerance times the baseline's
+    #returns a list of (parameters, baseline time per collision, time per collision)
+    before = {}
+    for row in baseline['results']:
+        if 'error' not in row:
+            before[_key(row)] = row['time_per_event']
+    regressions = []
+    for row in report['results']:
+        key = _key(row)
+        if 'error' not in row and key in before and \
+                row['time_per_event'] > tolerance*before[key]:
+            regressions.append((dict(key), before[key], row['time_per_event']))
+    return regressions
+
+def _key(row):
+    #the parameters of a row, used to match rows of two reports
+    return tuple(sorted((name, value) for name, value in row.items() \
+                        if name not in TIMINGS and name != 'error'))
+
+def save_report(report, path):
+    #a function for writing a report to a JSON file
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1, default=float)
+
+def load_report(path):
+    #a function for reading a report written by save_report
+    with open(path) as f:
+        return json.load(f)
+
+def main(arguments=None):
+    #the command line interface, returns 1 if any case regressed against the baseline
+    parser = argparse.ArgumentParser(description="Time simulations over a grid of parameters")
+    parser.add_argument('--numberofballs', type=int, nargs='+', \
+                        default=DEFAULT_GRID['numberofballs'])
+    parser.add_argument('--containerradius', type=float, nargs='+', \
+                        default=DEFAULT_GRID['containerradius'])
+    parser.add_argument('--radius', type=float, nargs='+', default=DEFAULT_GRID['radius'])
+    parser.add_argument('--sigma', type=float, nargs='+', default=DEFAULT_GRID['sigma'])
+    parser.add_argument('--engine', nargs='+', default=['event'])
+    parser.add_argument('--backend', nargs='+', default=['reference'])
+    parser.add_argument('--spatial-index', action='store_true')
+    parser.add_argument('--lazy', action='store_true')
+    parser.add_argument('--frames', type=int, default=1000, help="collisions per run")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('--output', help="JSON file to write the report to")
+    parser.add_argument('--baseline', help="JSON report to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    options = parser.parse_args(arguments)
+
+    grid = dict(numberofballs=options.numberofballs, containerradius=options.containerradius, \
+                radius=options.radius, sigma=options.sigma, engine=options.engine, \
+                backend=options.backend)
+    if options.spatial_index:
+        grid['spatial_index'] = [True]
+    if options.lazy:
+        grid['lazy'] = [True]
+    report = benchmark(grid, options.frames, options.seed, options.repeat, \
+                       not options.no_memory, verbose=True)
+    names = dict(SCALED)
+    for fit in report['scaling']:
+        print("%s ~ N^%.2f (%s points)" %(names[fit['y']], fit['exponent'], fit['points']))
+    if options.output:
+        save_report(report, options.output)
+    if options.baseline:
+        regressions = compare(report, load_report(options.baseline), options.tolerance)
+        for parameters, before, after in regressions:
+            print("slower: %s %.3g -> %.3g s/collision" %(parameters, before, after))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
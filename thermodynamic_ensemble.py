@@ -0,0 +1,162 @@
+"""
+A module for the Ensemble class, for running many independent simulations together
+"""
+
+import numpy
+
+from thermodynamic_particles import pair_times, collision_velocities
+from thermodynamic_packing import initial_positions
+
+class Ensemble():
+    """
+    A Class for running M independent simulations (replicas) of the same number of balls
+    in lock-step, with the state of every replica held in stacked (M,N+1,2) arrays
+    (the container is ball 0 of each replica)
+    Each step finds the next collision of every replica with vectorised reductions
+    and performs all M collisions at once, each replica keeping its own time
+
+    sigma can be a single value or one value per replica, so a temperature sweep can be
+    run as one ensemble and give error bars on the pressure-temperature gradient
+    """
+    def __init__(self, replicas=5, mass=10.0, radius=1.0, numberofballs=10, \
+                 containerradius=10.0, containermass=1e20, sigma=20, seed=None):
+        #initialing parameters of the ensemble
+        self._M = replicas
+        self._N = numberofballs
+        self._R = containerradius
+        rng = numpy.random.RandomState(seed)
+        self._sigma = numpy.broadcast_to(numpy.asarray(sigma, dtype=float), \
+                                         (replicas,)).copy()
+
+        #the masses and radii are the same in every replica
+        self.masses = numpy.full(numberofballs + 1, float(mass))
+        self.masses[0] = containermass
+        self.radii = numpy.full(numberofballs + 1, float(radius))
+        self.radii[0] = containerradius
+
+        #starting each replica from its own sites of the hexagonal grid and its own velocities
+        self.positions = numpy.zeros((replicas, numberofballs + 1, 2))
+        self.velocities = numpy.zeros((replicas, numberofballs + 1, 2))
+        for m in range(0, replicas):
+            self.positions[m, 1:] = initial_positions(self.radii[1:], containerradius, rng)
+            dist = rng.normal(0, self._sigma[m], numberofballs*2)
+            self.velocities[m, 1:, 0] = dist[:numberofballs]
+            self.velocities[m, 1:, 1] = dist[numberofballs:]
+        self.bounce_times = numpy.zeros((replicas, numberofballs + 1)) #used for calculating pressure
+
+        #initialising varibles of the gases, each entry of a list holds one value per replica
+        self._t = numpy.zeros(replicas) #time elapsed of each replica
+        self._t_list = [] #list of times at which collisions occur
+        self._kinetic_energy_total = [] #list of total kinetic energy of each gas throughout time
+        self._temperature = [] #list of temperature of each gas throughout time
+        self._pressure_evolution = [[], []] #pressure caused by a collision (nan if not with the container), time of the collision
+        self._total_momentum = [] #list of net momentum of each gas throughout time
+
+        #predicted time of the collision of every pair of balls in every replica
+        self._replica = numpy.arange(replicas)
+        self._event_times = numpy.full((replicas, numberofballs + 1, \
+                                        numberofballs + 1), numpy.inf)
+        for i in range(0, numberofballs + 1):
+            self._predict(numpy.full(replicas, i))
+
+    def _contact_radii(self, i):
+        #a function for the distance between the centres of ball i and every other ball when they touch
+        #returns (distances, whether one of the pair is the container)
+        R_relative = self.radii[i][:, None] + self.radii[None, :]
+        inside = (i == 0)[:, None] | (numpy.arange(self._N + 1) == 0)[None, :]
+        return numpy.where(inside, numpy.abs(self.radii[i][:, None] - \
+                           self.radii[None, :]), R_relative), inside
+
+    def _predict(self, i):
+        #a function for updating the predicted collisions of ball i[m] of each replica m with every other ball
+        times = pair_times(self.positions[self._replica, i][:, None] - self.positions, \
+                           self.velocities[self._replica, i][:, None] - self.velocities, \
+                           *self._contact_radii(i))
+        times[self._replica, i] = numpy.inf
+        times = self._t[:, None] + times
+        self._event_times[self._replica, i, :] = times
+        self._event_times[self._replica, :, i] = times
+
+    def next_collision(self):
+        #function that finds the next collision of every replica and causes them all
+        #finding which balls will collide next, the first pair in order as in Simulation.find_collision
+        flat = self._event_times.reshape(self._M, -1)
+        k = numpy.argmin(flat, axis=1)
+        t_event = flat[self._replica, k]
+        first, second = numpy.divmod(k, self._N + 1)
+
+        #moving all the balls of each replica to the time of its collision
+        self.positions += self.velocities*(t_event - self._t)[:, None, None]
+        self._t = t_event
+        self._t_list.append(self._t.copy())
+
+        #performing the collisions
+        v_first = self.velocities[self._replica, first]
+        v_second = self.velocities[self._replica, second]
+        m_first = self.masses[first]
+        m_second = self.masses[second]
+        k_initial = 0.5*(m_first*numpy.einsum('ij,ij->i', v_first, v_first) + \
+                         m_second*numpy.einsum('ij,ij->i', v_second, v_second))
+        v_first_new, v_second_new = collision_velocities( \
+            self.positions[self._replica, first], \
+            self.positions[self._replica, second], \
+            v_first, v_second, m_first, m_second)
+        k_final = 0.5*(m_first*numpy.einsum('ij,ij->i', v_first_new, v_first_new) + \
+                       m_second*numpy.einsum('ij,ij->i', v_second_new, v_second_new))
+        if numpy.any(k_initial - k_final > k_initial*1e-3): #checking for energy conservation
+            raise Exception("Oh no energy is not conserved!")
+        self.velocities[self._replica, first] = v_first_new
+        self.velocities[self._replica, second] = v_second_new
+
+        #calculating pressure for the replicas where a ball hit the container
+        wall = (first == 0) | (second == 0)
+        ball = numpy.where(first == 0, second, first)
+        v_ball_new = numpy.where((first == 0)[:, None], v_second_new, v_first_new)
+        v_ball_old = numpy.where((first == 0)[:, None], v_second, v_first)
+        impulse = self.masses[ball]*numpy.sqrt(numpy.einsum('ij,ij->i', \
+            v_ball_new - v_ball_old, v_ball_new - v_ball_old))
+        #as in Simulation, a ball pushed back in straight away (when it started outside) has no 
+        #time since its last bounce and gives no pressure (nan)
+        interval = self._t - self.bounce_times[self._replica, ball]
+        recorded = wall & (interval > 0.0)
+        pressure = impulse/(2*numpy.pi*self._R)/numpy.where(recorded, interval, 1.0)
+        self._pressure_evolution[0].append(numpy.where(recorded, pressure, numpy.nan))
+        self._pressure_evolution[1].append(self._t.copy())
+        self.bounce_times[self._replica[wall], ball[wall]] = self._t[wall]
+
+        #only the events of the two balls that collided change
+        self._predict(first)
+        self._predict(second)
+
+        #evaluating variables at time of collision
+        KE_total = 0.5*numpy.einsum('j,mjk,mjk->m', self.masses, \
+                                     self.velocities, self.velocities)
+        self._kinetic_energy_total.append(KE_total)
+        self._temperature.append(KE_total/(3*self._N*1.38e-23))
+        self._total_momentum.append(numpy.einsum('j,mjk->mk', self.masses, \
+                                                 self.velocities))
+
+    def run(self, num_frames):
+        #a function for progressing every replica along for a given number of collisions (frames)
+        for frame in range(num_frames):
+            self.next_collision()
+
+    def pressure(self):
+        #a function for calculating the pressure of the gas of each replica
+        #as in Simulation.pressure the first two collisions with the container are left out
+        samples = numpy.array(self._pressure_evolution[0]).T
+        self._pressure = numpy.array([numpy.mean(replica[~numpy.isnan(replica)][2:]) \
+                                      for replica in samples])
+        return self._pressure
+
+    def temperature(self):
+        #a function that returns the current temperature of the gas of each replica
+        return self._temperature[-1]
+
+    def pressure_temperature_fit(self):
+        #a function for fitting a straight line to the pressure against the temperature of the replicas
+        #returns (gradient, intercept, error in gradient, error in intercept)
+        line, covariance = numpy.polyfit(self.temperature(), self.pressure(), 1, \
+                                         cov=True)
+        return line[0], line[1], numpy.sqrt(covariance[0, 0]), \
+            numpy.sqrt(covariance[1, 1])
@@ -0,0 +1,114 @@
+"""
+A module for the CellGrid class, a uniform grid of square cells over the container
+used to find which balls are close enough to collide
+"""
+
+import numpy
+
+class CellGrid():
+    """
+    A Class for creating a uniform grid of square cells covering the container
+    The cells are at least as wide as the distance between the centres of two touching balls,
+    so two balls can only collide if they are in the same or neighbouring cells
+    """
+    def __init__(self, containerradius, cellsize, positions, indices=None):
+        #initialing parameters of the grid, placing the balls of the given indices 
+        #(all of them if not given an argument) at the given positions (N,2)
+        self._n = max(int(2*containerradius//cellsize), 1) #number of cells along each side
+        self._width = 2*containerradius/self._n #width of a cell, no smaller than cellsize
+        self._origin = -containerradius #position of the corner of the grid
+        self.cells = [set() for i in range(0, self._n**2)] #the balls in each cell
+        self.cell_of = numpy.full(len(positions), -1) #the cell each ball is in, -1 if not in the grid
+        if indices is None:
+            indices = numpy.arange(len(positions))
+        indices = numpy.asarray(indices, dtype=int)
+        for i, cell in zip(indices.tolist(), \
+                           self.locate(numpy.asarray(positions)[indices]).tolist()):
+            self.cell_of[i] = cell
+            self.cells[cell].add(i)
+
+    def locate(self, positions):
+        #a function for finding the cells that the given positions (N,2) are in
+        #positions outside the grid are put in the nearest cell at its edge
+        ij = numpy.floor((numpy.asarray(positions) - self._origin)/self._width)
+        ij = numpy.clip(ij.astype(int), 0, self._n - 1)
+        return ij[..., 0]*self._n + ij[..., 1]
+
+    def move(self, i, cell):
+        #a function for moving ball i into the given cell
+        self.cells[self.cell_of[i]].discard(i)
+        self.cells[cell].add(i)
+        self.cell_of[i] = cell
+
+    def neighbours(self, i):
+        #a function that returns the balls in the cell of ball i and the 8 cells around it
+        cx, cy = divmod(int(self.cell_of[i]), self._n)
+        found = []
+        for x in range(max(cx - 1, 0), min(cx + 2, self._n)):
+            for y in range(max(cy - 1, 0), min(cy + 2, self._n)):
+                found.extend(self.cells[x*self._n + y])
+        return numpy.array(found, dtype=int)
+
+    def pairs(self):
+        #a function that returns every pair of balls in the same or neighbouring cells, each pair once,
+        #as two arrays (first balls, second balls) with the first ball of each pair the lower
+        balls = numpy.flatnonzero(self.cell_of >= 0)
+        cells = self.cell_of[balls]
+        order = numpy.argsort(cells, kind='stable')
+        balls, cells = balls[order], cells[order] #the balls sorted by cell
+        counts = numpy.bincount(cells, minlength=self._n**2) #number of balls in each cell
+        starts = numpy.cumsum(counts) - counts #where each cell starts in the sorted balls
+        cx, cy = divmod(cells, self._n)
+        firsts = []
+        seconds = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                valid = (cx + dx >= 0) & (cx + dx < self._n) & (cy + dy >= 0) & (cy + dy < self._n)
+                neighbour = numpy.where(valid, (cx + dx)*self._n + cy + dy, 0)
+                number = numpy.where(valid, counts[neighbour], 0)
+                #pairing each ball with every ball of the neighbouring cell
+                first = numpy.repeat(balls, number)
+                offsets = numpy.arange(len(first)) - numpy.repeat(numpy.cumsum(number) - number, number)
+                second = balls[numpy.repeat(starts[neighbour], number) + offsets]
+                firsts.append(first[first < second])
+                seconds.append(second[first < second])
+        return numpy.concatenate(firsts), numpy.concatenate(seconds)
+
+    def crossings(self, indices, positions, velocities):
+        #a vectorised form of crossing for the balls of the given indices at the given positions 
+        #and velocities (K,2), returns (times, new cells) with infinity and -1 for balls that never leave
+        cell = self.cell_of[indices]
+        c = numpy.stack(divmod(cell, self._n), axis=1)
+        best = numpy.full(len(cell), numpy.inf)
+        newcell = numpy.full(len(cell), -1)
+        for axis, step in ((0, self._n), (1, 1)):
+            up = (velocities[:, axis] > 0.0) & (c[:, axis] + 1 < self._n)
+            down = (velocities[:, axis] < 0.0) & (c[:, axis] > 0)
+            edge = self._origin + numpy.where(up, c[:, axis] + 1, c[:, axis])*self._width
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                dt = numpy.where(up | down, (edge - positions[:, axis])/velocities[:, axis], \
+                                 numpy.inf)
+            better = dt < best
+            best = numpy.where(better, numpy.maximum(dt, 0.0), best)
+            newcell = numpy.where(better, cell + numpy.where(up, step, -step), newcell)
+        return best, newcell
+
+    def crossing(self, i, position, velocity):
+        #a function for finding how long until ball i leaves its cell and which cell it moves into
+        #returns (time, new cell), with a time of infinity if it never leaves (edges of the grid)
+        cx, cy = divmod(int(self.cell_of[i]), self._n)
+        best = (numpy.inf, -1)
+        for axis, c, step in ((0, cx, self._n), (1, cy, 1)):
+            if velocity[axis] > 0.0 and c + 1 < self._n:
+                edge = self._origin + (c + 1)*self._width
+                dt = (edge - position[axis])/velocity[axis]
+                newcell = self.cell_of[i] + step
+            elif velocity[axis] < 0.0 and c > 0:
+                edge = self._origin + c*self._width
+                dt = (edge - position[axis])/velocity[axis]
+                newcell = self.cell_of[i] - step
+            else:
+                continue
+            if dt < best[0]:
+                best = (max(dt, 0.0), int(newcell))
+        return best
@@ -0,0 +1,319 @@
+"""
+A module for saving simulations to files: checkpoints that a simulation can be
+resumed from, trajectory files that can be read without loading them into memory,
+and results files of the summaries and time series of many runs
+"""
+
+import json
+import numbers
+import os
+import zipfile
+
+import numpy
+
+from thermodynamic_simulation import Simulation
+from thermodynamic_observers import Observer, SeriesRecorder
+from thermodynamic_sweep import summarise
+
+def save_checkpoint(simulation, path):
+    #a function for saving the whole state of a simulation to a compact binary (.npz) file
+    #saved: positions, velocities, masses, radii, bounce times, random number generator,
+    #time, running totals and the observables of its recorder and pressure statistics
+    #other observers are not saved and need attaching again after load_checkpoint
+    store = simulation._store
+    recorder = simulation._recorder
+    stats = simulation._pressure_stats.stats
+    rng_state = simulation._rng.get_state()
+    arrays = dict(
+        arguments=json.dumps(simulation._arguments, default=float),
+        positions=store.current_positions(),
+        velocities=store.velocities,
+        masses=store.masses,
+        radii=store.radii,
+        bounce_times=store.bounce_times,
+        is_container=store.is_container,
+        species=store.species,
+        wall_impulses=store.wall_impulses,
+        t=simulation._t,
+        collision_count=simulation._collision_count,
+        wall_impulse=simulation._wall_impulse,
+        kinetic_energy=simulation._kinetic_energy,
+        momentum=simulation._momentum,
+        drift=numpy.array(simulation._drift, dtype=float).reshape(3, -1),
+        rng_keys=rng_state[1],
+        rng_state=numpy.array(rng_state[2:], dtype=float),
+        recorder=numpy.array([-1 if recorder._capacity is None else \
+                              recorder._capacity, recorder._every, recorder._count]),
+        series_t=numpy.array(recorder.t),
+        series_kinetic_energy=numpy.array(recorder.kinetic_energy),
+        series_temperature=numpy.array(recorder.temperature),
+        series_momentum=numpy.array(recorder.momentum).reshape(-1, 2),
+        series_pressure=numpy.array(recorder.pressure[0]),
+        series_pressure_t=numpy.array(recorder.pressure[1]),
+        pressure_stats=numpy.array([stats._skip, stats.count, stats.mean, stats._m2]))
+    #writing to a temporary file first so a crash while saving leaves the last checkpoint intact
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        numpy.savez(f, **arrays)
+    os.replace(temporary, path)
+
+def load_checkpoint(path):
+    #a function for creating a simulation from a checkpoint saved by save_checkpoint
+    #the simulation carries on from where it was saved
+    data = numpy.load(path)
+    arguments = json.loads(str(data['arguments']))
+    capacity, every, count = data['recorder'].tolist()
+    recorder = SeriesRecorder(None if capacity < 0 else int(capacity), int(every))
+    #the balls are made at their saved positions, so nothing is placed or predicted twice
+    #and numpy's global random numbers are left alone
+    simulation = Simulation(recorder=recorder, _state=(data['positions'][1:], \
+                            data['velocities'][1:]), **arguments)
+
+    #the state of the balls
+    store = simulation._store
+    store.positions[:] = data['positions']
+    store.velocities[:] = data['velocities']
+    store.masses[:] = data['masses']
+    store.radii[:] = data['radii']
+    store.bounce_times[:] = data['bounce_times']
+    store.is_container[:] = data['is_container']
+    store.species[:] = data['species']
+    store.wall_impulses[:] = data['wall_impulses']
+    simulation._t = float(data['t'])
+    store.time = simulation._t
+    store.local_times[:] = simulation._t
+    simulation._collision_count = int(data['collision_count'])
+    simulation._wall_impulse = float(data['wall_impulse'])
+    simulation._kinetic_energy = float(data['kinetic_energy'])
+    simulation._momentum = data['momentum'].copy()
+    simulation._drift = [list(row) for row in data['drift']]
+    has_gauss, cached_gaussian = data['rng_state'][1:].tolist()
+    simulation._rng = numpy.random.RandomState()
+    simulation._rng.set_state(('MT19937', data['rng_keys'], \
+                               int(data['rng_state'][0]), int(has_gauss), cached_gaussian))
+
+    #the observables
+    recorder._count = int(count)
+    for name in ('t', 'kinetic_energy', 'temperature', 'momentum'):
+        for value in data['series_' + name]:
+            getattr(recorder, name).append(value)
+    for value, t in zip(data['series_pressure'], data['series_pressure_t']):
+        recorder.pressure[0].append(value)
+        recorder.pressure[1].append(t)
+    stats = simulation._pressure_stats.stats
+    skip, stats.count, stats.mean, stats._m2 = data['pressure_stats'].tolist()
+    stats._skip = int(skip)
+    stats.count = int(stats.count)
+
+    #the predicted collisions are worked out from the restored state
+    if simulation._engine == 'event':
+        simulation.predict_all()
+    return simulation
+
+class Checkpointer(Observer):
+    """
+    A Class derived from Observer for saving a checkpoint of the simulation every given
+    number of collisions, so a long run can be resumed with load_checkpoint after a crash
+    """
+    def __init__(self, path, every=10000):
+        self._path = path
+        self._every = every
+        self._count = 0
+
+    def update(self, event, simulation):
+        self._count += 1
+        if self._count % self._every == 0:
+            save_checkpoint(simulation, self._path)
+
+#the header of a trajectory file is this tag followed by the number of balls (int64)
+TRAJECTORY_TAG = b'TDBTRAJ1'
+TRAJECTORY_HEADER = len(TRAJECTORY_TAG) + 8
+
+class TrajectoryWriter(Observer):
+    """
+    A Class derived from Observer for appending a frame of the positions of every ball
+    (the container is ball 0) to a binary file every given number of collisions
+    Each frame is the time followed by the positions, all as float64
+    Writing to an existing file of the same number of balls carries on appending to it
+    """
+    def __init__(self, path, numberofballs, every=1):
+        #initialing parameters of the writer and writing the header of a new file
+        self._path = path
+        self._every = every
+        self._count = 0
+        if os.path.exists(path) and os.path.getsize(path) >= TRAJECTORY_HEADER:
+            with open(path, 'rb') as f:
+                header = f.read(TRAJECTORY_HEADER)
+            if header[:len(TRAJECTORY_TAG)] != TRAJECTORY_TAG or \
+                    numpy.frombuffer(header[len(TRAJECTORY_TAG):], numpy.int64)[0] \
+                    != numberofballs + 1:
+                raise ValueError("%s is not a trajectory of %s balls" \
+                                 %(path, numberofballs))
+            #dropping any frame that was only partly written when a run stopped
+            frame = 8*(1 + 2*(numberofballs + 1))
+            frames = (os.path.getsize(path) - TRAJECTORY_HEADER)//frame
+            with open(path, 'r+b') as f:
+                f.truncate(TRAJECTORY_HEADER + frames*frame)
+        else:
+            with open(path, 'wb') as f:
+                f.write(TRAJECTORY_TAG)
+                f.write(numpy.int64(numberofballs + 1).tobytes())
+        self._file = open(path, 'ab')
+
+    def update(self, event, simulation):
+        #a function for appending the positions at the time of every every-th collision
+        self._count += 1
+        if (self._count - 1) % self._every != 0:
+            return
+        self._file.write(numpy.float64(event.t).tobytes())
+        self._file.write(simulation._store.current_positions().tobytes())
+        self._file.flush()
+
+    def close(self):
+        #a function for closing the file
+        self._file.close()
+
+def read_trajectory(path):
+    #a function for reading a trajectory file written by TrajectoryWriter without loading it into memory
+    #returns (times of the frames, positions of the balls in each frame (frames, N+1, 2)),
+    #both memory-mapped views of the file
+    with open(path, 'rb') as f:
+        header = f.read(TRAJECTORY_HEADER)
+    if header[:len(TRAJECTORY_TAG)] != TRAJECTORY_TAG:
+        raise ValueError("%s is not a trajectory file" %path)
+    balls = int(numpy.frombuffer(header[len(TRAJECTORY_TAG):], numpy.int64)[0])
+    width = 1 + 2*balls
+    frames = (os.path.getsize(path) - TRAJECTORY_HEADER)//(8*width)
+    if frames == 0:
+        return numpy.zeros(0), numpy.zeros((0, balls, 2))
+    data = numpy.memmap(path, dtype=numpy.float64, mode='r', \
+                        offset=TRAJECTORY_HEADER, shape=(frames, width))
+    return data[:, 0], data[:, 1:].reshape(frames, balls, 2)
+
+def save_results(runs, path, compress=True):
+    #a function for saving the results of runs to a columnar (.npz) file that load_results reads
+    #runs is a simulation, a list of simulations or a results table returned by sweep
+    #the summary of every run (parameters, pressure, temperature, ...) is stored one column per name,
+    #and the time series of each run (kept by sweep with keep_series, every series of a simulation)
+    #one array per series, so any of them can be read without reading the rest
+    #compress=True compresses every column (zip deflate)
+    if isinstance(runs, Simulation):
+        runs = [runs]
+    rows = []
+    for run in runs:
+        if isinstance(run, Simulation):
+            row = dict(run._arguments)
+            row.update(summarise(run, keep_series=True))
+            run = row
+        rows.append(run)
+    names = []
+    for row in rows:
+        names += [name for name in row if name not in names]
+    arrays = {}
+    summary = []
+    encoded = [] #columns of values that aren't all numbers or all text, stored as JSON text
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if any(isinstance(value, numpy.ndarray) for value in values):
+            for index, value in enumerate(values):
+                if value is not None:
+                    arrays['series/%s/%s' %(index, name)] = numpy.ascontiguousarray(value)
+            continue
+        summary.append(name)
+        if all(isinstance(value, (numbers.Number, numpy.bool_)) for value in values) or \
+                all(isinstance(value, str) for value in values):
+            arrays['summary/' + name] = numpy.array(values)
+        else:
+            encoded.append(name)
+            arrays['summary/' + name] = numpy.array([json.dumps(value, default=float) \
+                                                     for value in values])
+    arrays['meta'] = json.dumps(dict(runs=len(rows), summary=summary, encoded=encoded))
+    #writing to a temporary file first so a crash while saving leaves the last file intact
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        (numpy.savez_compressed if compress else numpy.savez)(f, **arrays)
+    os.replace(temporary, path)
+
+def load_results(path):
+    #a function for opening a results file written by save_results, returns a Results
+    return Results(path)
+
+class Results():
+    """
+    A Class for reading a results file written by save_results without loading it all into memory
+    The summary of every run is read when the file is opened, a time series is only read 
+    when it is asked for, and chunks() reads one in pieces of a fixed number of values
+    rows() gives the summary as a results table like those of sweep, so column() works on it
+    """
+    def __init__(self, path):
+        #opening the file and reading the summary
+        self._path = path
+        self._file = numpy.load(path)
+        meta = json.loads(str(self._file['meta']))
+        self._runs = meta['runs']
+        self._summary = {}
+        for name in meta['summary']:
+            values = self._file['summary/' + name]
+            if name in meta['encoded']:
+                values = [json.loads(str(value)) for value in values]
+            self._summary[name] = values
+
+    def __len__(self):
+        return self._runs
+
+    def names(self):
+        #a function that returns the names of the summary columns
+        return list(self._summary)
+
+    def series_names(self, run=0):
+        #a function that returns the names of the time series saved for the given run
+        prefix = 'series/%s/' %run
+        return [name[len(prefix):] for name in self._file.files if name.startswith(prefix)]
+
+    def column(self, name):
+        #a function that returns a summary column as an array, one value per run
+        values = self._summary[name]
+        if isinstance(values, numpy.ndarray):
+            return values
+        column = numpy.empty(len(values), dtype=object) #e.g. a list of masses for each run
+        column[:] = values
+        return column
+
+    def rows(self):
+        #a function that returns the summary as a list with one row (dictionary) per run
+        return [{name: (values[index].item() if isinstance(values, numpy.ndarray) \
+                        else values[index]) for name, values in self._summary.items()} \
+                for index in range(self._runs)]
+
+    def series(self, run, name):
+        #a function that reads the whole of a time series of the given run
+        return self._file['series/%s/%s' %(run, name)]
+
+    def chunks(self, run, name, size=65536):
+        #a generator of a time series of the given run in pieces of at most size values
+        #(along its first axis), reading only one piece at a time from the file
+        with zipfile.ZipFile(self._path) as archive, \
+                archive.open('series/%s/%s.npy' %(run, name)) as f:
+            version = numpy.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(f)
+            if len(shape) == 0:
+                yield numpy.frombuffer(f.read(dtype.itemsize), dtype).reshape(shape)
+                return
+            width = int(numpy.prod(shape[1:]))
+            for start in range(0, shape[0], size):
+                count = min(size, shape[0] - start)
+                data = numpy.frombuffer(f.read(count*width*dtype.itemsize), dtype)
+                yield data.reshape((count,) + tuple(shape[1:]))
+
+    def close(self):
+        #a function for closing the file
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
@@ -0,0 +1,136 @@
+"""
+A module of kernels for the hot path of a simulation (the time until two balls collide,
+the search for the next collision and the elastic collision) working on the raw
+float64 arrays of a ParticleStore
+They are compiled with numba when it is installed, otherwise they are plain Python
+The kernels release the GIL, so threads can run them at the same time
+"""
+
+from math import sqrt, inf
+
+try:
+    from numba import njit
+    COMPILED = True
+except ImportError:
+    COMPILED = False
+    def njit(*args, **kwargs):
+        #without numba the kernels are left as plain Python functions
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+@njit(cache=True, nogil=True)
+def pair_time(rx, ry, vx, vy, R, inside):
+    #kernel form of Ball.time_to_collision from the relative position and velocity of
+    #two balls, the distance between their centres when they touch and whether one is the container
+    dotrr = rx*rx + ry*ry
+    dotrv = rx*vx + ry*vy
+    dotvv = vx*vx + vy*vy
+    c = dotrr - R*R
+    discriminant = dotrv*dotrv - dotvv*c
+    if inside: #a ball hits the container from the inside, at the larger root
+        if dotrv > 0.0:
+            if c < 0.0:
+                return -c/(dotrv + sqrt(discriminant))
+            return 0.0
+        if dotvv > 0.0 and discriminant >= 0.0:
+            return (sqrt(discriminant) - dotrv)/dotvv
+        return inf
+    #two balls only meet if they are approaching, at the smaller root
+    if dotrv >= 0.0 or discriminant < 0.0:
+        return inf
+    if c <= 0.0:
+        return 0.0
+    return c/(sqrt(discriminant) - dotrv)
+
+@njit(cache=True, nogil=True)
+def times_to_collision(positions, velocities, radii, is_container, local_times, \
+                       time, i, others, out):
+    #kernel form of ParticleStore.times_to_collision, the times until ball i collides with
+    #each of the balls in others are written into out
+    xi = positions[i, 0] + velocities[i, 0]*(time - local_times[i])
+    yi = positions[i, 1] + velocities[i, 1]*(time - local_times[i])
+    for k in range(len(others)):
+        j = others[k]
+        if j == i:
+            out[k] = inf
+            continue
+        xj = positions[j, 0] + velocities[j, 0]*(time - local_times[j])
+        yj = positions[j, 1] + velocities[j, 1]*(time - local_times[j])
+        inside = is_container[i] or is_container[j]
+        if inside:
+            R = radii[i] - radii[j]
+        else:
+            R = radii[i] + radii[j]
+        out[k] = pair_time(xi - xj, yi - yj, velocities[i, 0] - velocities[j, 0], \
+                           velocities[i, 1] - velocities[j, 1], R, inside)
+    return out
+
+@njit(cache=True, nogil=True)
+def times_between(positions, velocities, radii, is_container, local_times, time, \
+                  first, second, out):
+    #kernel form of ParticleStore.times_between, the times until each pair of balls
+    #(first[k], second[k]) collide are written into out
+    for k in range(len(first)):
+        i = first[k]
+        j = second[k]
+        inside = is_container[i] or is_container[j]
+        if inside:
+            R = radii[i] - radii[j]
+        else:
+            R = radii[i] + radii[j]
+        out[k] = pair_time(positions[i, 0] + velocities[i, 0]*(time - local_times[i]) - \
+                           (positions[j, 0] + velocities[j, 0]*(time - local_times[j])), \
+                           positions[i, 1] + velocities[i, 1]*(time - local_times[i]) - \
+                           (positions[j, 1] + velocities[j, 1]*(time - local_times[j])), \
+                           velocities[i, 0] - velocities[j, 0], \
+                           velocities[i, 1] - velocities[j, 1], R, inside)
+    return out
+
+@njit(cache=True, nogil=True)
+def scan(positions, velocities, radii, is_container):
+    #kernel form of the scan of every pair of balls in Simulation.find_collision
+    #returns (time until the collision, first ball, second ball)
+    deltat = inf
+    firstball = 0
+    secondball = 0
+    for i in range(len(radii)):
+        for j in range(len(radii)):
+            if i != j:
+                inside = is_container[i] or is_container[j]
+                if inside:
+                    R = radii[i] - radii[j]
+                else:
+                    R = radii[i] + radii[j]
+                currentdt = pair_time(positions[i, 0] - positions[j, 0], \
+                                      positions[i, 1] - positions[j, 1], \
+                                      velocities[i, 0] - velocities[j, 0], \
+                                      velocities[i, 1] - velocities[j, 1], R, inside)
+                if currentdt < deltat: #ties go to the first pair in order
+                    deltat = currentdt
+                    firstball = i
+                    secondball = j
+    return deltat, firstball, secondball
+
+@njit(cache=True, nogil=True)
+def collide(positions, velocities, masses, i, j):
+    #kernel form of the velocity update of Ball.collide for balls i and j, done in place
+    rx = positions[i, 0] - positions[j, 0]
+    ry = positions[i, 1] - positions[j, 1]
+    norm = sqrt(rx*rx + ry*ry)
+    nx = rx/norm
+    ny = ry/norm
+    px = -ny
+    py = nx
+    i_parr = velocities[i, 0]*nx + velocities[i, 1]*ny
+    i_perp = velocities[i, 0]*px + velocities[i, 1]*py
+    j_parr = velocities[j, 0]*nx + velocities[j, 1]*ny
+    j_perp = velocities[j, 0]*px + velocities[j, 1]*py
+    mi = masses[i]
+    mj = masses[j]
+    i_parr_new = ((mi - mj)/(mi + mj))*i_parr + ((2*mj)/(mi + mj))*j_parr
+    j_parr_new = ((2*mi)/(mi + mj))*i_parr + ((mj - mi)/(mi + mj))*j_parr
+    velocities[i, 0] = i_parr_new*nx + i_perp*px
+    velocities[i, 1] = i_parr_new*ny + i_perp*py
+    velocities[j, 0] = j_parr_new*nx + j_perp*px
+    velocities[j, 1] = j_parr_new*ny + j_perp*py
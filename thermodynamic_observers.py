@@ -0,0 +1,189 @@
+"""
+A module for observers, which are fed the stream of collisions of a simulation
+and keep the observables of the gas in a bounded amount of memory
+"""
+
+from collections import namedtuple
+
+import numpy
+
+#what an observer is given after every collision, pressure is None unless a ball hit the container
+CollisionEvent = namedtuple('CollisionEvent', ['t', 'first', 'second', \
+    'kinetic_energy', 'temperature', 'momentum', 'pressure'])
+
+class RingBuffer():
+    """
+    A Class for a series of fixed capacity backed by a preallocated array
+    Once it is full the oldest values are overwritten, so it holds the latest capacity values
+    It can be indexed, iterated over and turned into an array like a list
+    """
+    def __init__(self, capacity, shape=()):
+        #initialing parameters of the buffer
+        self._data = numpy.zeros((capacity,) + tuple(shape))
+        self._capacity = capacity
+        self._count = 0 #number of values ever appended
+
+    def append(self, value):
+        #a function for adding a value to the end of the series
+        self._data[self._count % self._capacity] = value
+        self._count += 1
+
+    def __len__(self):
+        return min(self._count, self._capacity)
+
+    def array(self):
+        #a function that returns the values of the series in order as an array
+        if self._count <= self._capacity:
+            return self._data[:self._count].copy()
+        start = self._count % self._capacity
+        return numpy.concatenate([self._data[start:], self._data[:start]])
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.array()
+        return values if dtype is None else values.astype(dtype)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.array()[index]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("ring buffer index out of range")
+        return self._data[(self._count - len(self) + index) % self._capacity]
+
+    def __iter__(self):
+        return iter(self.array())
+
+class Observer():
+    """
+    A Class that all observers are derived from
+    An observer is given every collision of the simulation it is attached to
+    """
+    def update(self, event, simulation):
+        #a function called after every collision with the CollisionEvent and the simulation
+        pass
+
+class SeriesRecorder(Observer):
+    """
+    A Class derived from Observer for recording the time series of the observables of the gas
+    every gives how many collisions there are between recorded values (1 records every collision),
+    capacity limits the series to their latest capacity values with RingBuffers,
+    if not given the series are lists that keep growing
+    """
+    def __init__(self, capacity=None, every=1):
+        #initialing the series
+        if capacity is None:
+            new = lambda shape: []
+        else:
+            new = lambda shape: RingBuffer(capacity, shape)
+        self._capacity = capacity
+        self._every = every
+        self._count = 0 #number of collisions seen
+        self.t = new(()) #times at which collisions occur
+        self.kinetic_energy = new(()) #total kinetic energy of the gas
+        self.temperature = new(()) #temperature of the gas
+        self.momentum = new((2,)) #net momentum of the gas
+        self.pressure = [new(()), new(())] #pressure caused by a collision, time of the collision
+
+    def update(self, event, simulation):
+        #a function for recording the observables of every collision that is kept
+        self._count += 1
+        if (self._count - 1) % self._every != 0:
+            return
+        self.t.append(event.t)
+        self.kinetic_energy.append(event.kinetic_energy)
+        self.temperature.append(event.temperature)
+        self.momentum.append(event.momentum)
+        if event.pressure is not None:
+            self.pressure[0].append(event.pressure)
+            self.pressure[1].append(event.t)
+
+class TimeSampler():
+    """
+    A Class for recording the observables of the gas at fixed intervals of time, 
+    as Simulation.run_until does, rather than at every collision
+    The pressure recorded is the running estimate of Simulation.pressure with its standard error,
+    wall_pressure is the momentum given to the container since the last sample over the time 
+    between them (nan for the first sample), the running mean of which is kept in stats
+    capacity limits the series to their latest capacity values as in SeriesRecorder
+    """
+    def __init__(self, capacity=None):
+        #initialing the series
+        if capacity is None:
+            new = lambda shape: []
+        else:
+            new = lambda shape: RingBuffer(capacity, shape)
+        self.t = new(()) #times of the samples
+        self.collisions = new(()) #number of collisions so far
+        self.kinetic_energy = new(()) #total kinetic energy of the gas
+        self.temperature = new(()) #temperature of the gas
+        self.momentum = new((2,)) #net momentum of the gas
+        self.pressure = new(()) #running estimate of the pressure
+        self.pressure_error = new(()) #standard error of the running estimate of the pressure
+        self.wall_pressure = new(()) #pressure on the container between samples
+        self.stats = RunningStats() #running mean of wall_pressure
+        self._last = None #time and momentum given to the container at the last sample
+
+    def sample(self, simulation):
+        #a function for recording the observables of the simulation at its current time
+        kinetic_energy = simulation.kinetic_energy_total()
+        self.t.append(simulation._t)
+        self.collisions.append(simulation._collision_count)
+        self.kinetic_energy.append(kinetic_energy)
+        self.temperature.append(simulation.temperature(kinetic_energy))
+        self.momentum.append(simulation.total_momentum())
+        self.pressure.append(simulation.pressure())
+        self.pressure_error.append(simulation.pressure_error())
+        wall_pressure = numpy.nan
+        if self._last is not None and simulation._t > self._last[0]:
+            wall_pressure = (simulation._wall_impulse - self._last[1])/ \
+                (simulation._t - self._last[0])
+            self.stats.add(wall_pressure)
+        self.wall_pressure.append(wall_pressure)
+        self._last = (simulation._t, simulation._wall_impulse)
+
+class RunningStats():
+    """
+    A Class for the running mean and variance of a stream of values (Welford's method)
+    The first skip values are left out
+    """
+    def __init__(self, skip=0):
+        #initialing parameters of the statistics
+        self._skip = skip
+        self.count = 0 #number of values used
+        self.mean = numpy.nan
+        self._m2 = 0.0 #sum of the squared differences from the mean
+
+    def add(self, value):
+        #a function for adding a value to the statistics
+        if self._skip > 0:
+            self._skip -= 1
+            return
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return
+        delta = value - self.mean
+        self.mean += delta/self.count
+        self._m2 += delta*(value - self.mean)
+
+    def variance(self):
+        #a function that returns the sample variance of the values
+        return self._m2/(self.count - 1) if self.count > 1 else numpy.nan
+
+    def standard_error(self):
+        #a function that returns the standard error of the mean of the values
+        return numpy.sqrt(self.variance()/self.count) if self.count > 1 \
+            else numpy.nan
+
+class PressureStatistics(Observer):
+    """
+    A Class derived from Observer for the running mean and variance of the pressure of the gas
+    As in Simulation.pressure the first two collisions with the container are left out
+    """
+    def __init__(self, skip=2):
+        self.stats = RunningStats(skip)
+
+    def update(self, event, simulation):
+        if event.pressure is not None:
+            self.stats.add(event.pressure)
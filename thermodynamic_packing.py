@@ -0,0 +1,78 @@
+"""
+A module for placing the balls of a simulation in the container at the start,
+on a hexagonal grid that fills the whole of the container so no two balls overlap
+"""
+
+import numpy
+
+def _rows(reach, spacing):
+    #a function that returns the rows of a hexagonal grid of the given spacing covering a circle of
+    #radius reach: the number of each row, how far it is moved along and its first and last column
+    height = spacing*numpy.sqrt(3)/2
+    rows = int(reach/height)
+    row = numpy.arange(-rows, rows + 1)
+    shift = 0.5*(row % 2) #every other row is moved along by half a spacing
+    half = numpy.sqrt(numpy.maximum(reach**2 - (row*height)**2, 0.0))/spacing
+    return row, shift, numpy.ceil(-half - shift).astype(int), \
+        numpy.floor(half - shift).astype(int)
+
+def hex_lattice(radius, containerradius, gap=None, spacing=None):
+    #a function that returns the centres (K,2) of a hexagonal grid of balls of the given radius
+    #covering the inside of the container, with every ball inside the container
+    #gap is the space left between neighbouring balls and between the balls and the container,
+    #by default a tenth of the radius
+    #spacing is the distance between neighbouring centres, at least (and by default) 2*radius + gap
+    if gap is None:
+        gap = 0.1*radius
+    if spacing is None:
+        spacing = 2*radius + gap
+    reach = containerradius - radius - gap #furthest a centre can be from the centre of the container
+    if reach < 0.0:
+        return numpy.zeros((0, 2))
+    row, shift, first, last = _rows(reach, spacing)
+    counts = last - first + 1
+    #the row of each site and its column counted along from the first column of the row
+    rowof = numpy.repeat(numpy.arange(len(row)), counts)
+    column = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts) + \
+        first[rowof]
+    x = (column + shift[rowof])*spacing
+    y = row[rowof]*spacing*numpy.sqrt(3)/2
+    return numpy.stack([x, y], axis=1)
+
+def max_balls(radius, containerradius, gap=None):
+    #a function that returns the most balls of the given radius that fit in the container
+    #(for balls of different radii, the most that fit of the largest radius)
+    #the sites are counted row by row, so tiny balls don't need the whole grid to be made
+    if gap is None:
+        gap = 0.1*radius
+    reach = containerradius - radius - gap
+    if reach < 0.0:
+        return 0
+    row, shift, first, last = _rows(reach, 2*radius + gap)
+    return int((last - first + 1).sum())
+
+def initial_positions(radii, containerradius, rng=numpy.random, gap=None):
+    #a function for placing balls of the given radii at random sites of a hexagonal grid for the
+    #largest ball, so balls of different sizes don't overlap either
+    #balls much smaller than the container are spread over a coarser grid of about twice as many 
+    #sites as balls, rather than one of every site that fits
+    #rng is used to choose the sites, returns the positions (N,2)
+    #raises a ValueError giving the most balls that fit if there are too many
+    radii = numpy.asarray(radii, dtype=float)
+    if len(radii) == 0:
+        return numpy.zeros((0, 2))
+    radius = radii.max()
+    if gap is None:
+        gap = 0.1*radius
+    most = max_balls(radius, containerradius, gap)
+    if len(radii) > most:
+        raise ValueError("%s balls don't fit in the container, at most %s of radius %s do" \
+                         %(len(radii), most, radius))
+    closest = 2*radius + gap
+    reach = containerradius - radius - gap
+    spacing = max(closest, reach*numpy.sqrt(numpy.pi/(numpy.sqrt(3)*len(radii))))
+    sites = hex_lattice(radius, containerradius, gap, spacing)
+    while len(sites) < len(radii): #too few sites in the coarser grid once rounded
+        spacing = max(closest, 0.95*spacing)
+        sites = hex_lattice(radius, containerradius, gap, spacing)
+    return sites[rng.permutation(len(sites))[:len(radii)]]
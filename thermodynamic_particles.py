@@ -0,0 +1,160 @@
+"""
+A module for the ParticleStore class, which keeps the state of many balls in
+contiguous arrays, and for the vectorised kinematics that work on those arrays
+"""
+
+import numpy
+
+class ParticleStore():
+    """
+    A Class for storing the positions, velocities, masses, radii and bounce times
+    of many balls in contiguous (N,2) and (N,) arrays
+    Ball objects are lightweight views into one row of a ParticleStore
+    
+    Each ball also has a local time, the time at which its stored position was last updated,
+    so positions can be brought up to the time of the store only when they are needed
+    """
+    def __init__(self, size):
+        #initialing the arrays of the store, filled in by the balls that view into it
+        self.positions = numpy.zeros((size, 2))
+        self.velocities = numpy.zeros((size, 2))
+        self.masses = numpy.zeros(size)
+        self.radii = numpy.zeros(size)
+        self.bounce_times = numpy.zeros(size) #used for calculating pressure
+        self.is_container = numpy.zeros(size, dtype=bool)
+        self.species = numpy.zeros(size, dtype=numpy.int64) #species each ball belongs to
+        self.wall_impulses = numpy.zeros(size) #momentum each ball has given the container per length of its wall
+        self.time = 0.0 #time of the store
+        self.local_times = numpy.zeros(size) #time at which each stored position was last updated
+
+    def __len__(self):
+        #the number of balls in the store
+        return len(self.masses)
+
+    def move(self, dt):
+        #a function for moving every ball in the store due to its velocity for a time dt
+        self.positions += self.velocities * dt
+        self.time += dt
+        self.local_times[:] = self.time
+
+    def advance(self, dt):
+        #a function for moving the time of the store on by dt without moving any ball
+        #the positions are then brought up to date by sync when they are needed
+        self.time += dt
+
+    def sync(self, indices=None):
+        #a function for bringing the stored positions of the given balls (all if not given 
+        #an argument) up to the time of the store
+        if indices is None:
+            indices = slice(None)
+        self.positions[indices] += self.velocities[indices]* \
+            (self.time - self.local_times[indices])[..., None]
+        self.local_times[indices] = self.time
+
+    def current_positions(self, indices=None):
+        #a function that returns the positions of the given balls at the time of the store
+        #without changing the stored positions
+        if indices is None:
+            indices = slice(None)
+        return self.positions[indices] + self.velocities[indices]* \
+            (self.time - self.local_times[indices])[..., None]
+
+    def kinetic_energy(self):
+        #a function that returns the total kinetic energy of the balls in the store
+        return 0.5*numpy.dot(self.masses, \
+            numpy.einsum('ij,ij->i', self.velocities, self.velocities))
+
+    def species_kinetic_energy(self, count):
+        #a function that returns the total kinetic energy of the balls of each of the count species
+        #(the container is left out)
+        balls = ~self.is_container
+        return numpy.bincount(self.species[balls], 0.5*self.masses[balls]* \
+            numpy.einsum('ij,ij->i', self.velocities[balls], self.velocities[balls]), count)
+
+    def linear_momentum(self):
+        #a function that returns the total linear momentum of the balls in the store
+        return numpy.dot(self.masses, self.velocities)
+
+    def contact_radii(self, i, others):
+        #a function for the distance between the centres of ball i and the other balls when they touch
+        #for the container the ball touches the inside, so the radii are subtracted
+        inside = self.is_container[i] | self.is_container[others]
+        return numpy.where(inside, self.radii[i] - self.radii[others], \
+                           self.radii[i] + self.radii[others])
+
+    def times_to_collision(self, i, others=None):
+        #a batched form of Ball.time_to_collision for ball i against the other balls
+        #returns infinity for any ball it will not collide with, including itself
+        if others is None:
+            others = numpy.arange(len(self))
+        others = numpy.asarray(others, dtype=int)
+        times = pair_times(self.current_positions(i) - self.current_positions(others), \
+                           self.velocities[i] - self.velocities[others], \
+                           self.contact_radii(i, others), \
+                           self.is_container[i] | self.is_container[others])
+        times[others == i] = numpy.inf
+        return times
+
+    def times_between(self, first, second):
+        #a batched form of Ball.time_to_collision for the pairs of balls (first[k], second[k])
+        inside = self.is_container[first] | self.is_container[second]
+        R_relative = numpy.where(inside, self.radii[first] - self.radii[second], \
+                                 self.radii[first] + self.radii[second])
+        return pair_times(self.current_positions(first) - self.current_positions(second), \
+                          self.velocities[first] - self.velocities[second], \
+                          R_relative, inside)
+
+    def all_times_to_collision(self):
+        #a batched form of Ball.time_to_collision for all pairs of balls at once
+        #returns an (N,N) array with infinity on the diagonal and for pairs that will not collide
+        inside = self.is_container[:, None] | self.is_container[None, :]
+        R_relative = numpy.where(inside, \
+                                 self.radii[:, None] - self.radii[None, :], \
+                                 self.radii[:, None] + self.radii[None, :])
+        positions = self.current_positions()
+        times = pair_times(positions[:, None] - positions[None, :], \
+                           self.velocities[:, None] - self.velocities[None, :], \
+                           R_relative, inside)
+        numpy.fill_diagonal(times, numpy.inf)
+        return times
+
+def pair_times(r_relative, v_relative, R_relative, inside=False):
+    #vectorised form of Ball.time_to_collision for arrays of relative positions and velocities (...,2),
+    #the distances between the centres at contact (...) and whether one of the pair is the container (...)
+    #returns infinity for pairs that will not collide and 0 for pairs that overlap and are still approaching
+    dotrr = numpy.einsum('...i,...i->...', r_relative, r_relative)
+    dotrv = numpy.einsum('...i,...i->...', r_relative, v_relative)
+    dotvv = numpy.einsum('...i,...i->...', v_relative, v_relative)
+    #δt=(-v.r±sqrt((r.v)^2-v.v*(r.r-R^2)))/v.v
+    c = dotrr - R_relative*R_relative
+    discriminant = dotrv*dotrv - dotvv*c
+    real = discriminant >= 0.0
+    root = numpy.sqrt(numpy.where(real, discriminant, 0.0))
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        #two balls only meet if they are approaching, at the smaller root
+        outer = numpy.where((dotrv < 0.0) & real, \
+                            numpy.where(c > 0.0, c/(root - dotrv), 0.0), numpy.inf)
+        #a ball hits the container from the inside, at the larger root
+        inner = numpy.where(dotrv > 0.0, numpy.where(c < 0.0, -c/(dotrv + root), 0.0), \
+                            numpy.where((dotvv > 0.0) & real, (root - dotrv)/dotvv, numpy.inf))
+    return numpy.where(inside, inner, outer)
+
+def collision_velocities(r1, r2, v1, v2, m1, m2):
+    #vectorised form of the velocity update of Ball.collide for arrays of pairs of balls
+    #positions and velocities are (...,2) and masses (...), returns the new velocities (v1, v2)
+    r_relative = r1 - r2
+    r_relative_norm = r_relative/numpy.sqrt(numpy.einsum('...i,...i->...', \
+        r_relative, r_relative))[..., None]
+    r_relative_perp_norm = numpy.stack([-r_relative_norm[..., 1], \
+        r_relative_norm[..., 0]], axis=-1)
+    v1_parr = numpy.einsum('...i,...i->...', v1, r_relative_norm)
+    v1_perp = numpy.einsum('...i,...i->...', v1, r_relative_perp_norm)
+    v2_parr = numpy.einsum('...i,...i->...', v2, r_relative_norm)
+    v2_perp = numpy.einsum('...i,...i->...', v2, r_relative_perp_norm)
+    v1_new = ((((m1 - m2)/(m1 + m2))*v1_parr + \
+        ((2*m2)/(m1 + m2))*v2_parr)[..., None]*r_relative_norm + \
+        v1_perp[..., None]*r_relative_perp_norm)
+    v2_new = ((((2*m1)/(m1 + m2))*v1_parr + \
+        ((m2 - m1)/(m1 + m2))*v2_parr)[..., None]*r_relative_norm + \
+        v2_perp[..., None]*r_relative_perp_norm)
+    return v1_new, v2_new
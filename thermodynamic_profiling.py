@@ -0,0 +1,179 @@
+"""
+A module for the Profiler class, which measures where the time of a simulation goes
+"""
+
+import threading
+from time import perf_counter
+
+import numpy
+
+from thermodynamic_observers import RingBuffer
+
+#the steps of a collision that are timed, and the methods of Simulation that make them up
+PHASES = ('find', 'prediction', 'advance', 'collision', 'bookkeeping')
+TIMED = (('find_collision', 'find'), ('predict', 'prediction'), \
+         ('_predict_crossing', 'prediction'), ('move_all', 'advance'), \
+         ('_collide_balls', 'collision'))
+
+#the columns of the per-collision trace
+TRACE = ('t', 'first', 'second', 'wall_time', 'pair_tests', 'rejected', 'immediate', \
+         'crossings', 'queue')
+
+class Profiler():
+    """
+    A Class for timing and counting the work done by a simulation for each collision
+    Attaching it replaces the methods of that one simulation with timed versions, so a
+    simulation without a profiler runs the normal methods with no extra cost
+    The time of each step is its own, leaving out the steps called from within it:
+    find (the event queue or scan), prediction (new collision times), advance (moving the balls),
+    collision (the new velocities) and bookkeeping (the rest of a collision: running totals,
+    pressure and observers)
+    It counts the pair tests, the pairs that never collide, the pairs that collide straight
+    away because they overlap (which should be rare), the cell crossings and the size of the
+    event queue, and with trace=capacity also keeps these for each of the latest capacity collisions
+    Every time worked out is counted: the predictions, the time of each event worked out again
+    before it is used and with the scan engine every pair of the scan, whose times are worked
+    out a second time from the same positions (left out of the timings) as the scan only keeps
+    the earliest
+    """
+    def __init__(self, trace=None):
+        #initialing the timers and counters
+        self.times = dict.fromkeys(PHASES, 0.0) #seconds spent in each step
+        self.collisions = 0
+        self.pair_tests = 0 #number of pairs of balls whose collision time was worked out
+        self.rejected = 0 #pairs that never collide
+        self.immediate = 0 #pairs that collide straight away
+        self.crossings = 0 #number of balls moving into a different cell
+        #pair tests, rejected, immediate and crossings of this collision
+        self._event = numpy.zeros(4, dtype=numpy.int64)
+        self._lock = threading.Lock() #the threads of predict_all count at the same time
+        self._children = [] #time spent in the steps called from each step being timed
+        self._trace = None if trace is None else RingBuffer(trace, (len(TRACE),))
+        self._simulation = None
+
+    def attach(self, simulation):
+        #a function for timing the given simulation
+        if self._simulation is not None:
+            raise ValueError("the profiler is already attached to a simulation")
+        self._simulation = simulation
+        for name, phase in TIMED:
+            setattr(simulation, name, self._timed(getattr(simulation, name), phase))
+        times = simulation._times
+        simulation._times = lambda i, others: self._count(times(i, others))
+        times_between = simulation._times_between
+        simulation._times_between = lambda first, second: \
+            self._count(times_between(first, second))
+        pair_time = simulation._pair_time
+        simulation._pair_time = lambda i, j: self._count(pair_time(i, j))
+        if simulation._engine == 'scan':
+            simulation.find_collision = self._scanned(simulation.find_collision)
+        simulation._cross = self._crossed(simulation._cross)
+        simulation._collide = self._timed(simulation._collide, 'bookkeeping', \
+                                          self._end_event)
+        simulation._store.sync = self._timed(simulation._store.sync, 'advance')
+        self._last = perf_counter()
+        return self
+
+    def detach(self):
+        #a function for putting back the normal methods of the simulation
+        simulation = self._simulation
+        for name in [name for name, phase in TIMED] + ['_times', '_times_between', \
+                                                       '_pair_time', '_cross', '_collide']:
+            del simulation.__dict__[name]
+        del simulation._store.__dict__['sync']
+        self._simulation = None
+
+    def _timed(self, function, phase, after=None):
+        #a function that returns function timed as part of phase
+        def timed(*args):
+            self._children.append(0.0)
+            start = perf_counter()
+            try:
+                return function(*args)
+            finally:
+                elapsed = perf_counter() - start
+                self.times[phase] += elapsed - self._children.pop()
+                if self._children:
+                    self._children[-1] += elapsed
+                if after is not None:
+                    after(*args)
+        return timed
+
+    def _count(self, dt, tests=1):
+        #a function for counting the pair tests of a collision time or an array of them,
+        #each standing for tests pair tests
+        with self._lock:
+            self._event[0] += tests*numpy.size(dt)
+            self._event[1] += tests*numpy.count_nonzero(dt == numpy.inf)
+            self._event[2] += tests*numpy.count_nonzero(dt == 0.0)
+        return dt
+
+    def _scanned(self, function):
+        #a function that returns the scan of find_collision with the pairs it tests counted
+        def scanned():
+            found = function()
+            simulation = self._simulation
+            start = perf_counter()
+            #the time of a pair is the same either way round, and the scan tests both
+            for first, second in simulation._pair_blocks():
+                self._count(simulation._store.times_between(first, second), 2)
+            self._last += perf_counter() - start #left out of the time of the collision
+            return found
+        return scanned
+
+    def _crossed(self, function):
+        #a function that returns function counted as a cell crossing
+        def crossed(event):
+            self._event[3] += 1
+            return function(event)
+        return crossed
+
+    def _end_event(self, deltat, firstball, secondball):
+        #a function for adding the counts of a collision to the totals and the trace
+        simulation = self._simulation
+        self.collisions += 1
+        self.pair_tests += int(self._event[0])
+        self.rejected += int(self._event[1])
+        self.immediate += int(self._event[2])
+        self.crossings += int(self._event[3])
+        now = perf_counter()
+        if self._trace is not None:
+            self._trace.append((simulation._t, firstball, secondball, now - self._last) + \
+                               tuple(self._event) + (len(simulation._events),))
+        self._last = now
+        self._event[:] = 0
+
+    def trace(self):
+        #a function that returns the per-collision trace as a dictionary of arrays (see TRACE)
+        if self._trace is None:
+            raise ValueError("the profiler was not made with trace=capacity")
+        values = self._trace.array()
+        return {name: values[:, column] for column, name in enumerate(TRACE)}
+
+    def summary(self):
+        #a function that returns the totals as a dictionary: the seconds and fraction of the time
+        #of each step, collisions per second and the mean counts per collision
+        total = sum(self.times.values())
+        collisions = max(self.collisions, 1)
+        summary = dict(collisions=self.collisions, seconds=total, \
+                       collisions_per_second=self.collisions/total if total > 0.0 else numpy.nan)
+        for phase in PHASES:
+            summary[phase] = self.times[phase]
+            summary[phase + '_fraction'] = self.times[phase]/total if total > 0.0 else numpy.nan
+        for name in ('pair_tests', 'rejected', 'immediate', 'crossings'):
+            summary[name + '_per_collision'] = getattr(self, name)/collisions
+        return summary
+
+    def report(self):
+        #a function that returns the summary as text
+        summary = self.summary()
+        lines = ["%s collisions in %.4g s (%.4g collisions/s)" %(summary['collisions'], \
+                 summary['seconds'], summary['collisions_per_second'])]
+        for phase in PHASES:
+            lines.append("%-12s %.4g s (%.1f%%)" %(phase, summary[phase], \
+                                                  100*summary[phase + '_fraction']))
+        lines.append(("per collision: %.4g pair tests, %.4g never collide, " + \
+                      "%.4g straight away, %.4g cell crossings") \
+                     %(summary['pair_tests_per_collision'], summary['rejected_per_collision'], \
+                       summary['immediate_per_collision'], summary['crossings_per_collision']))
+        return "\n".join(lines)
@@ -2,150 +2,602 @@
 A module for creating simulations
 """
 
-import matplotlib.pyplot as plt
-import scipy as sp
-import random
+import heapq
+import importlib.util
+import os
+import warnings
+import numpy
 
 from thermodynamic_ball import Ball, Container
+from thermodynamic_particles import ParticleStore
+from thermodynamic_grid import CellGrid
+from thermodynamic_packing import initial_positions
+from thermodynamic_observers import CollisionEvent, SeriesRecorder, \
+    PressureStatistics, TimeSampler
+from thermodynamic_analysis import pair_distance_histogram, RadialDistribution
+
+#the thermodynamic_kernels module, only imported by a simulation with the compiled backend
+#as numba (and the scipy it loads) takes a while to import
+kernels = None
+#number of pairs of balls in each block of predict_all
+BLOCK = 65536
+#how many times heavier than the heaviest ball the container has to be for a ball hitting it
+#to change its velocity by less than the rounding of the velocities (about 1e-15 of them)
+IMMOVABLE = 1e15
+
+def _import_kernels(): 
+    #a function for importing the compiled kernels the first time they are needed
+    global kernels
+    if kernels is None:
+        import thermodynamic_kernels
+        kernels = thermodynamic_kernels
+
+def _pyplot(): 
+    #matplotlib is only imported when something is drawn, so simulations can run without it
+    import matplotlib.pyplot as plt
+    return plt
 
 class Simulation():
     """
     A composition of the Ball and Container classes
     This class is used to create Simulations of Ideal Gases inside a container
     and investigate certain Physics parameters of the gases given certain initial conditions
+    
+    engine selects how the next collision is found:
+    'event' keeps a priority queue of predicted collisions and only recomputes
+    the events of the two balls that collided,
+    'scan' checks every pair of balls on every collision (the original method)
+    
+    spatial_index=True splits the container into a grid of cells so that the 'event' 
+    engine only predicts collisions between balls in neighbouring cells, 
+    horizon is the time a ball at the rms speed takes to cross a cell beyond touching 
+    distance and so sets the size of the cells
+    
+    lazy=True stops the 'event' engine moving every ball on every collision, each ball 
+    keeps the time its position was last updated and is only moved when it collides 
+    or its position is read
+    
+    mass and radius can be one value for every ball or a list of one value per ball
+    For a mixture of species numberofballs is a list of the number of balls of each species, 
+    and mass, radius and sigma can then be lists of one value per species
+    The balls start at random sites of a hexagonal grid filling the container 
+    (thermodynamic_packing module), a ValueError says how many fit if there are too many
+    
+    seed makes the initial conditions reproducible, if not given the global 
+    random number generator of numpy is used
+    
+    Every collision is passed to a list of observers, recorder is the SeriesRecorder 
+    that keeps the time series (one that keeps every collision if not given an argument, 
+    give SeriesRecorder(capacity, every) to keep memory bounded) and observers are any 
+    other Observers to be fed the collisions
+    
+    The total kinetic energy and momentum are kept as running totals updated from the 
+    two balls of each collision, resum_every gives how many collisions there are between 
+    recalculating them from every ball (never if not given an argument), the difference 
+    found each time is kept in _drift
+    
+    backend selects the code used for the time until two balls collide and for collisions:
+    'reference' uses the methods of Ball and ParticleStore, 'compiled' uses the kernels of 
+    thermodynamic_kernels compiled with numba (the reference backend is used if numba is 
+    not installed)
+    
+    threads is the number of threads that share the work of predicting every collision at once 
+    (at the start and when restoring a checkpoint), all of the cores if None
     """
     def __init__(self, mass=10.0, radius=1.0, numberofballs=10, \
-                 containerradius=10.0, containermass=1e20, sigma=20): 
+                 containerradius=10.0, containermass=1e20, sigma=20, \
+                 engine='event', spatial_index=False, horizon=None, lazy=False, \
+                 seed=None, recorder=None, observers=(), resum_every=None, \
+                 backend='reference', threads=1, _state=None): 
         #initialing parameters of the simulation
-        self._container = Container(containermass, containerradius) #creating the container
+        #_state is only used by thermodynamic_io.load_checkpoint: the (positions, velocities) of the
+        #balls to start from instead of random ones, leaving the collisions to be predicted by it
+        if engine not in ('event', 'scan'):
+            raise ValueError("engine must be 'event' or 'scan'")
+        if backend not in ('reference', 'compiled'):
+            raise ValueError("backend must be 'reference' or 'compiled'")
+        if backend == 'compiled' and importlib.util.find_spec('numba') is None:
+            warnings.warn("numba is not installed, using the reference backend")
+            backend = 'reference'
+        if backend == 'compiled':
+            _import_kernels()
+        self._backend = backend
+        self._threads = os.cpu_count() if threads is None else threads
+        if (spatial_index or lazy) and engine != 'event':
+            raise ValueError("the spatial index and lazy mode need the 'event' engine")
+        #the arguments that make the same kind of simulation, used to restore checkpoints
+        self._arguments = dict(mass=numpy.asarray(mass).tolist(), \
+            radius=numpy.asarray(radius).tolist(), \
+            numberofballs=numpy.asarray(numberofballs).tolist(), \
+            containerradius=containerradius, containermass=containermass, \
+            sigma=numpy.asarray(sigma).tolist(), engine=engine, \
+            spatial_index=spatial_index, horizon=horizon, lazy=lazy, \
+            resum_every=resum_every, backend=backend, threads=threads)
+        #the species of each ball, with the values of each species given to each of its balls
+        if numpy.ndim(numberofballs) > 0:
+            self._counts = numpy.asarray(numberofballs, dtype=int)
+            species = numpy.repeat(numpy.arange(len(self._counts)), self._counts)
+            mass, radius, sigma = [numpy.broadcast_to(numpy.asarray(value, dtype=float), \
+                                   self._counts.shape)[species] for value in (mass, radius, sigma)]
+            numberofballs = int(self._counts.sum())
+        else:
+            self._counts = numpy.array([numberofballs])
+            species = numpy.zeros(numberofballs, dtype=int)
+        self._store = ParticleStore(numberofballs + 1) #arrays holding the state of every ball
+        self._store.species[1:] = species
+        self._store.species[0] = -1
+        self._container = Container(containermass, containerradius, \
+                                    self._store, 0) #creating the container
         self.balls = [self._container] #list of the balls
         self._N = numberofballs 
         
-        #creating a guassion distribution for the initial velocties of the balls
-        dist = sp.random.normal(0, sigma, numberofballs*2) 
+        #random number generator for the initial conditions
+        if seed is None:
+            self._rng = numpy.random
+        else:
+            self._rng = numpy.random.RandomState(seed)
         
-        #creating an inscribed square grid of the container for the intial postions of the balls
-        positionx = sp.arange(-(containerradius-radius-0.1)/sp.sqrt(2), \
-            (containerradius-radius-0.1)/sp.sqrt(2), 2*radius + 0.5)
-        positiony = sp.arange(-(containerradius-radius-0.1)/sp.sqrt(2), \
-            (containerradius-radius-0.1)/sp.sqrt(2), 2*radius + 0.5)
-        position = []
-        for i in range(0, len(positionx)):
-            for j in range(0, len(positiony)):
-                position.append([positionx[i], positiony[j]])
-        random.shuffle(position) #randomly shuffling this list to start the balls at random postions
+        masses = numpy.broadcast_to(numpy.asarray(mass, dtype=float), (numberofballs,))
+        self._immovable = containermass >= IMMOVABLE*numpy.max(masses, initial=0.0)
+        radii = numpy.broadcast_to(numpy.asarray(radius, dtype=float), (numberofballs,))
+        if _state is None:
+            #creating a guassion distribution for the initial velocties of the balls
+            dist = self._rng.normal(0, numpy.tile(sigma, 2) if numpy.ndim(sigma) else sigma, \
+                                    numberofballs*2) 
+            velocity = numpy.stack([dist[:numberofballs], dist[numberofballs:]], axis=1)
+            #choosing random sites of a hexagonal grid filling the container for the intial postions of the balls
+            position = initial_positions(radii, containerradius, self._rng)
+        else:
+            position, velocity = _state
         
         #creating the balls
         for i in range(0, self._N):
-            self.balls.append(Ball(mass, radius, position[i], [dist[i], \
-                              dist[numberofballs + i]]))
+            self.balls.append(Ball(masses[i], radii[i], position[i], velocity[i], \
+                                   self._store, i + 1))
         
         #initialising varibles of the gas
         self._t = 0.0 #time elapsed of simulation
-        self._t_list = [] #list of times at which collisions occur
-        self._kinetic_energy_total = [] #list of total kinetic energy of the gas throughout time
-        self._temperature = [] #list of temperature of the gas throughout time
-        self._pressure_evolution = [[], []] #list of pressure caused by a collision, list of time of the collision  
-        self._total_momentum = [] #list of net momentum of the gas throughout time
+        if recorder is None:
+            recorder = SeriesRecorder()
+        self._recorder = recorder
+        self._pressure_stats = PressureStatistics() #running mean of the pressure
+        self._observers = [self._recorder, self._pressure_stats] + list(observers)
+        self._t_list = recorder.t #times at which collisions occur
+        self._kinetic_energy_total = recorder.kinetic_energy #total kinetic energy of the gas throughout time
+        self._temperature = recorder.temperature #temperature of the gas throughout time
+        self._pressure_evolution = recorder.pressure #pressure caused by a collision, time of the collision  
+        self._total_momentum = recorder.momentum #net momentum of the gas throughout time
+        self._kinetic_energy = self._store.kinetic_energy() #running total of kinetic energy
+        self._momentum = self._store.linear_momentum() #running total of momentum
+        self._resum_every = resum_every
+        self._drift = [[], [], []] #time of recalculating the totals, drift in kinetic energy, drift in momentum
+        self._collision_count = 0 #number of collisions so far
+        self._wall_impulse = 0.0 #total momentum given to the container per length of its wall
         
-    def next_collision(self): 
-        #function that checks when the next collsion will occur and causes it
-        #finding which balls will collide next
-        deltat = 1e10 
+        #initialising the event queue of predicted collisions
+        self._engine = engine
+        self._lazy = lazy
+        self._collisions = [0]*len(self.balls) #number of collisions of each ball, used to spot stale events
+        self._events = [] #heap of (time, first ball, second ball, collisions of first, collisions of second)
+        self._events_limit = 0 #size of the heap at which stale events are cleared out
+        self._grid = None #grid of cells used to find the neighbours of each ball
+        if spatial_index:
+            self._grid = self._build_grid(horizon)
+        if self._engine == 'event' and _state is None:
+            self.predict_all()
+    
+    def _build_grid(self, horizon): 
+        #a function for creating the grid of cells, sized from the largest ball and the rms speed
+        contact = 2*self._store.radii[1:].max() #distance between the centres of touching balls
+        speed = numpy.sqrt(numpy.mean(numpy.einsum('ij,ij->i', \
+            self._store.velocities[1:], self._store.velocities[1:])))
+        if horizon is None: #by default the extra width is a diameter or the mean spacing of the balls if larger
+            spacing = numpy.sqrt(numpy.pi*self._container._R**2/max(self._N, 1))
+            horizon = max(contact, spacing)/speed if speed > 0.0 else 0.0
+        return CellGrid(self._container._R, contact + speed*horizon, \
+                        self._store.positions, numpy.arange(1, len(self.balls)))
+    
+    def _candidates(self, i): 
+        #a function that returns the balls that ball i could collide with before it leaves its cell
+        if self._grid is None or self.balls[i].isContainer:
+            return numpy.arange(len(self.balls))
+        return numpy.append(self._grid.neighbours(i), 0)
+    
+    def _predict_crossing(self, i): 
+        #a function for adding the time at which ball i moves into a different cell to the event queue
+        dt, cell = self._grid.crossing(i, self._store.current_positions(i), \
+                                       self._store.velocities[i])
+        if dt < numpy.inf:
+            heapq.heappush(self._events, (self._t + dt, i, -1, \
+                self._collisions[i], cell))
+    
+    def _cross(self, event): 
+        #a function for moving a ball into its new cell and predicting its collisions with its new neighbours
+        i = event[1]
+        self._grid.move(i, event[4])
+        self.predict(i, self._grid.neighbours(i))
+        self._predict_crossing(i)
+        
+    def _times(self, i, others): 
+        #a function that returns the times until ball i collides with each of the given balls
+        #with the backend of the simulation
+        if self._backend == 'compiled':
+            store = self._store
+            return kernels.times_to_collision(store.positions, store.velocities, \
+                store.radii, store.is_container, store.local_times, store.time, \
+                i, others, numpy.empty(len(others)))
+        return self._store.times_to_collision(i, others)
+    
+    def predict(self, i, others): 
+        #a function for adding the predicted collisions between ball i and the given balls to the event queue
+        others = numpy.asarray(others, dtype=numpy.int64)
+        dt = self._times(i, others)
+        accepted = dt < numpy.inf
+        for j, currentdt in zip(others[accepted].tolist(), dt[accepted].tolist()):
+            first, second = min(i, j), max(i, j)
+            heapq.heappush(self._events, (self._t + currentdt, first, second, \
+                self._collisions[first], self._collisions[second]))
+    
+    def _times_between(self, first, second): 
+        #a function that returns the times until each pair of balls (first[k], second[k]) collide
+        #with the backend of the simulation
+        if self._backend == 'compiled':
+            store = self._store
+            return kernels.times_between(store.positions, store.velocities, \
+                store.radii, store.is_container, store.local_times, store.time, \
+                first, second, numpy.empty(len(first)))
+        return self._store.times_between(first, second)
+    
+    def _pair_blocks(self): 
+        #a generator of the blocks of pairs of balls (first balls, second balls) that predict_all 
+        #predicts the collisions of: every pair of balls, or when using the spatial index 
+        #every pair in neighbouring cells and every ball with the container
+        if self._grid is not None:
+            first, second = self._grid.pairs()
+            balls = numpy.flatnonzero(~self._store.is_container)
+            first = numpy.concatenate([numpy.zeros(len(balls), dtype=int), first])
+            second = numpy.concatenate([balls, second])
+            for start in range(0, len(first), BLOCK):
+                yield first[start:start + BLOCK], second[start:start + BLOCK]
+            return
+        N = len(self.balls)
+        rows = max(BLOCK//N, 1)
+        for start in range(0, N, rows):
+            first, second = numpy.nonzero(numpy.arange(start, min(start + rows, N))[:, None] < \
+                                          numpy.arange(N)[None, :])
+            yield first + start, second
+    
+    def _block_events(self, block): 
+        #a function that returns the times, first balls and second balls of the pairs of a block
+        #that will collide, this is what each thread of predict_all runs
+        first, second = block
+        dt = self._times_between(first, second)
+        accepted = dt < numpy.inf
+        return dt[accepted], first[accepted], second[accepted]
+    
+    def predict_all(self): 
+        #a function for (re)building the event queue from every pair of balls
+        #(only the pairs in neighbouring cells when using the spatial index)
+        #the blocks of pairs are shared out between the threads and their events merged into one queue
+        if self._threads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(self._threads) as pool:
+                found = list(pool.map(self._block_events, self._pair_blocks()))
+        else:
+            found = [self._block_events(block) for block in self._pair_blocks()]
+        collisions = numpy.asarray(self._collisions)
+        dt, first, second = [numpy.concatenate([block[k] for block in found]) \
+                             for k in range(3)]
+        self._events = list(zip((self._t + dt).tolist(), first.tolist(), second.tolist(), \
+            collisions[first].tolist(), collisions[second].tolist()))
+        if self._grid is not None: #the time each ball moves into a different cell
+            balls = numpy.flatnonzero(~self._store.is_container)
+            dt, cell = self._grid.crossings(balls, self._store.current_positions(balls), \
+                                            self._store.velocities[balls])
+            moving = dt < numpy.inf
+            self._events.extend(zip((self._t + dt[moving]).tolist(), \
+                balls[moving].tolist(), [-1]*int(moving.sum()), \
+                collisions[balls[moving]].tolist(), cell[moving].tolist()))
+        heapq.heapify(self._events)
+        self._events_limit = max(4*len(self._events), 1024)
+    
+    def _is_stale(self, event): 
+        #an event is stale if either ball has collided since it was predicted
+        #cell crossings are stored as (time, ball, -1, collisions of ball, new cell)
+        if event[2] < 0:
+            return event[3] != self._collisions[event[1]]
+        return event[3] != self._collisions[event[1]] or \
+            event[4] != self._collisions[event[2]]
+    
+    def _compact_events(self): 
+        #a function for removing the stale events so the heap does not grow without limit
+        self._events = [event for event in self._events \
+                        if not self._is_stale(event)]
+        heapq.heapify(self._events)
+        self._events_limit = max(4*len(self._events), 1024)
+    
+    def find_collision(self): 
+        #a function for finding which balls will collide next and how long until they do
+        #returns (time until the collision, first ball, second ball)
+        #ties are broken by the numbers of the balls, the first pair in order collides first
+        if self._engine == 'event':
+            while self._events:
+                event = self._events[0]
+                if self._is_stale(event) or event[2] < 0:
+                    heapq.heappop(self._events)
+                    if event[2] < 0 and not self._is_stale(event):
+                        self._cross(event)
+                    continue
+                if self._lazy:
+                    self._store.sync([event[1], event[2]])
+                #recomputing the time from the current positions gives the same time as the scan
+                deltat = self._pair_time(event[1], event[2])
+                if deltat < numpy.inf:
+                    return deltat, event[1], event[2]
+                heapq.heappop(self._events) #the balls are no longer approaching after rounding
+            return numpy.inf, 0, 0
+        if self._backend == 'compiled':
+            deltat, firstball, secondball = kernels.scan(self._store.positions, \
+                self._store.velocities, self._store.radii, self._store.is_container)
+            return float(deltat), int(firstball), int(secondball)
+        deltat = numpy.inf 
         firstball = 0
         secondball = 0
         for i in range(0, len(self.balls)): #checking how long until each ball collides
             for j in range(0, len(self.balls)):
                 if i != j: 
                     currentdt = (self.balls[i].time_to_collision(self.balls[j]))
-                    if currentdt < deltat and currentdt > 1e-10: #finding the minimum time until collsion
+                    if currentdt < deltat: #finding the minimum time until collsion
                         deltat = currentdt
                         firstball = i
                         secondball = j
-        
-        #performing the collision
+        return deltat, firstball, secondball
+    
+    def _pair_time(self, i, j): 
+        #a function that returns the time until balls i and j collide with the backend of the simulation
+        if self._backend == 'compiled':
+            store = self._store
+            return kernels.times_to_collision(store.positions, store.velocities, \
+                store.radii, store.is_container, store.local_times, store.time, \
+                i, numpy.array([j]), numpy.empty(1))[0]
+        return self.balls[i].time_to_collision(self.balls[j])
+    
+    def _collide_balls(self, first, second): 
+        #a function for colliding two balls with the backend of the simulation
+        if self._backend == 'reference':
+            first.collide(second)
+            return
+        #the same bookkeeping as Ball.collide around the compiled velocity update
+        for ball in (first, second):
+            ball.k_initial = ball.kinetic_energy()
+            ball.momentum_inital = ball.linear_momentum()
+        kernels.collide(self._store.positions, self._store.velocities, \
+                        self._store.masses, first._index, second._index)
+        if (first.k_initial + second.k_initial) - (first.kinetic_energy() + \
+            second.kinetic_energy()) > (first.k_initial + second.k_initial)*1e-3: #checking for energy conservation
+            raise Exception("Oh no energy is not conserved!")
+        if first.isContainer: #checking if either ball is the container to calculate pressure
+            first.collided(second)
+        if second.isContainer:
+            second.collided(first)
+    
+    def next_collision(self): 
+        #function that checks when the next collsion will occur and causes it
+        #finding which balls will collide next
+        deltat, firstball, secondball = self.find_collision()
+        self._collide(deltat, firstball, secondball)
+    
+    def advance_to(self, t_end, max_collisions=None): 
+        #a function for causing every collision before the time t_end and then moving 
+        #all the balls on to t_end, stopping early after max_collisions collisions if given
+        #returns the number of collisions
+        count = 0
+        while max_collisions is None or count < max_collisions:
+            deltat, firstball, secondball = self.find_collision()
+            if self._t + deltat > t_end:
+                deltat = t_end - self._t
+                self._t += deltat
+                self.move_all(deltat)
+                break
+            self._collide(deltat, firstball, secondball)
+            count += 1
+        return count
+    
+    def _collide(self, deltat, firstball, secondball): 
+        #a function for performing the collision of the two balls found by find_collision
         self._t += deltat #setting the time of the collsion
-        self._t_list.append(self._t)
         self.move_all(deltat) #moving all the balls to the point of collision
-        self.balls[firstball].collide(self.balls[secondball]) #causing the collsion
+        if self._lazy: #only the two balls that collide are moved in lazy mode
+            self._store.sync([firstball, secondball])
+        first, second = self.balls[firstball], self.balls[secondball]
+        self._collide_balls(first, second) #causing the collsion
+        self._collision_count += 1
+        #only the energy and momentum of the two balls that collided have changed
+        self._kinetic_energy += (first.kinetic_energy() + second.kinetic_energy()) - \
+            (first.k_initial + second.k_initial)
+        self._momentum = self._momentum + (first.linear_momentum() + \
+            second.linear_momentum()) - (first.momentum_inital + second.momentum_inital)
+        if self._resum_every and self._collision_count % self._resum_every == 0:
+            self.resum()
+        if self._engine == 'event': #only the events of the two balls that collided change
+            heapq.heappop(self._events)
+            if self._immovable and (first.isContainer or second.isContainer): 
+                #only the ball is predicted again, the events of the container with the other balls
+                #are kept as the velocity a ball gives a container this heavy (about 1e-20 of the 
+                #ball's at the default mass) makes no difference to when they happen
+                #a lighter container is predicted again against every ball like any other ball
+                ball = secondball if first.isContainer else firstball
+                self._collisions[ball] += 1
+                self.predict(ball, self._candidates(ball))
+            else:
+                self._collisions[firstball] += 1
+                self._collisions[secondball] += 1
+                self.predict(firstball, self._candidates(firstball))
+                others = self._candidates(secondball)
+                self.predict(secondball, others[others != firstball])
+            if self._grid is not None:
+                for i in (firstball, secondball):
+                    if not self.balls[i].isContainer:
+                        self._predict_crossing(i)
+            if len(self._events) > self._events_limit:
+                self._compact_events()
         
         #evaluating variables at time of collision
-        if self.balls[firstball].isContainer: #calculating pressure
-            self._pressure_evolution[0].append(self._container._pressuretime/ \
-                                              (self._t - \
-                                              self.balls[secondball].bounce_time))
-            self._pressure_evolution[1].append(self._t)
-            self.balls[secondball].bounce_time = self._t
-        elif self.balls[secondball].isContainer:
-            self._pressure_evolution[0].append(self._container._pressuretime/ \
-                                              (self._t - \
-                                              self.balls[firstball].bounce_time))
-            self._pressure_evolution[1].append(self._t)
-            self.balls[firstball].bounce_time = self._t
-        self.kinetic_energy_total() 
-        self.temperature()
-        self.total_momentum()
+        pressure = None
+        if first.isContainer or second.isContainer: #calculating pressure
+            ball = second if first.isContainer else first
+            self._wall_impulse += self._container._pressuretime
+            self._store.wall_impulses[ball._index] += self._container._pressuretime
+            #a ball pushed back in straight away (when it started outside) has no time since its last bounce
+            if self._t > ball.bounce_time:
+                pressure = self._container._pressuretime/(self._t - ball.bounce_time)
+            ball.bounce_time = self._t
+        kinetic_energy = self.kinetic_energy_total()
+        event = CollisionEvent(self._t, firstball, secondball, kinetic_energy, \
+                               self.temperature(kinetic_energy), \
+                               self.total_momentum(), pressure)
+        for observer in self._observers: #passing the collision to the observers
+            observer.update(event, self)
 
 
-    def run(self, num_frames, animate=False): 
+    def run(self, num_frames, animate=False, dt=None): 
         #a function for progressing the simulation along a for a given number of collsions (frames)
-        #and animating the frames
+        #and animating them, with the animation showing the gas every dt seconds of the simulation
+        #(see thermodynamic_animation.Renderer for the default)
         if animate:
-            f = plt.figure()
-            ax = plt.axes(xlim=(-self._container._R, self._container._R), \
-                          ylim=(-self._container._R, self._container._R))
-            ax.add_artist(self._container.patch)
-            for i in range(1, len(self.balls)):
-                ax.add_patch(self.balls[i].patch) 
+            from thermodynamic_animation import Renderer
+            Renderer(self, dt).show(num_frames)
+            return
         for frame in range(num_frames):
             self.next_collision()
-            if animate:
-                ax.set_title("Time=%s" %(self._t))
-                plt.pause(0.1)
-        if animate:
-            plt.show()
+    
+    def run_until(self, t_end, sample_interval=None, tol=None, min_samples=10, \
+                  sampler=None): 
+        #a function for progressing the simulation along until the time t_end
+        #sample_interval records the observables every sample_interval seconds into sampler 
+        #(a new TimeSampler if not given), starting at the current time and ending at t_end
+        #tol stops the run early once the pressure on the container over each sample_interval, 
+        #sampler.wall_pressure, has a mean with a standard error less than tol times the mean, 
+        #from at least min_samples intervals
+        #(the pressure of single collisions, as in pressure(), has too long a tail of huge values 
+        #from balls hitting the container twice in quick succession for its error to settle)
+        #returns the sampler
+        if t_end < self._t:
+            raise ValueError("t_end is before the current time of the simulation")
+        if tol is not None and sample_interval is None:
+            raise ValueError("stopping at a tolerance needs a sample_interval")
+        if sample_interval is not None and not sample_interval > 0.0:
+            raise ValueError("sample_interval must be greater than zero")
+        if sampler is None:
+            sampler = TimeSampler()
+        if sample_interval is None:
+            self.advance_to(t_end)
+            return sampler
+        stats = sampler.stats
+        start = self._t
+        sample = 0
+        while True:
+            #the times of the samples are counted from the start so they don't drift
+            self.advance_to(min(start + sample*sample_interval, t_end))
+            sampler.sample(self)
+            if self._t >= t_end or (tol is not None and stats.count >= min_samples and \
+                                    stats.standard_error() <= tol*abs(stats.mean)):
+                return sampler
+            sample += 1
         
     def kinetic_energy_total(self): 
-        #a function for calculating the total kinetic energy of the gas
-        KE_total = 0.0
-        for i in range(0, len(self.balls)):
-            KE_total += self.balls[i].kinetic_energy()
-        self._kinetic_energy_total.append(KE_total)
+        #a function that returns the total kinetic energy of the gas
+        return self._kinetic_energy
 
-    def temperature(self): 
+    def temperature(self, kinetic_energy=None): 
         #a function for calculating the temperature of the gas
-        self._temperature.append(self._kinetic_energy_total[-1]/ \
-                                (3*self._N*1.38e-23))      
+        if kinetic_energy is None:
+            kinetic_energy = self.kinetic_energy_total()
+        return kinetic_energy/(3*self._N*1.38e-23)
+    
+    def temperatures(self): 
+        #a function that returns the temperature of each species of the gas
+        return self._store.species_kinetic_energy(len(self._counts))/ \
+            (3*self._counts*1.38e-23)
+    
+    def partial_pressures(self): 
+        #a function that returns the pressure on the container from each species of the gas,
+        #the momentum the balls of each species have given the container over the time so far
+        balls = ~self._store.is_container
+        impulse = numpy.bincount(self._store.species[balls], \
+            self._store.wall_impulses[balls], len(self._counts))
+        return impulse/self._t if self._t > 0.0 else numpy.full(len(self._counts), numpy.nan)
     
     def total_momentum(self): 
-        #a function for calculating the total momentum of the gas
-        tot_time_momentum = 0
-        for i in range(len(self.balls)):
-            tot_time_momentum += self.balls[i].linear_momentum()
-        self._total_momentum.append(tot_time_momentum)
+        #a function that returns the total momentum of the gas
+        return self._momentum.copy()
+    
+    def resum(self): 
+        #a function for recalculating the total kinetic energy and momentum from every ball
+        #and recording how far the running totals had drifted from them
+        kinetic_energy = self._store.kinetic_energy()
+        momentum = self._store.linear_momentum()
+        self._drift[0].append(self._t)
+        self._drift[1].append(self._kinetic_energy - kinetic_energy)
+        self._drift[2].append(numpy.sqrt(numpy.dot(self._momentum - momentum, \
+                                             self._momentum - momentum)))
+        self._kinetic_energy = kinetic_energy
+        self._momentum = momentum
+    
+    def add_observer(self, observer): 
+        #a function for attaching another observer to be fed the collisions of the simulation
+        self._observers.append(observer)
+    
+    def instrument(self, trace=None): 
+        #a function for timing and counting the work done for each collision from now on
+        #returns the Profiler (thermodynamic_profiling module), whose report() gives the summary
+        #trace=capacity also keeps the counts of each of the latest capacity collisions
+        #profiler.detach() turns it off again
+        from thermodynamic_profiling import Profiler
+        return Profiler(trace).attach(self)
+    
+    def save(self, path): 
+        #a function for saving a checkpoint of the simulation to a file, 
+        #which thermodynamic_io.load_checkpoint resumes from
+        from thermodynamic_io import save_checkpoint
+        save_checkpoint(self, path)
+    
+    def save_results(self, path): 
+        #a function for saving the summary and time series of the simulation to a results file,
+        #which thermodynamic_io.load_results reads
+        from thermodynamic_io import save_results
+        save_results(self, path)
     
     def move_all(self, dt): 
         #a function for moving all the balls in the simulation
-        for i in range(0, len(self.balls)):
-            self.balls[i].move(dt)
+        #in lazy mode only the time moves on and each ball is moved when it is next needed
+        if self._lazy:
+            self._store.advance(dt)
+        else:
+            self._store.move(dt)
+    
+    def synchronise(self): 
+        #a function for bringing the positions of all the balls up to the time of the simulation
+        self._store.sync()
     
     def pressure(self): 
         #a function for calculating the pressure of the gas 
-        self._pressure_mean_data = []
-        for i in range(2, len(self._pressure_evolution[0])): 
-            self._pressure_mean_data.append(self._pressure_evolution[0][i])
-        self._pressure = sp.mean(self._pressure_mean_data)
+        #the running mean of the pressure of every collision with the container but the first two
+        self._pressure = self._pressure_stats.stats.mean
         return self._pressure
     
+    def pressure_error(self): 
+        #a function that returns the standard error of the pressure given by pressure()
+        return self._pressure_stats.stats.standard_error()
+    
     def distance_from_container(self): 
         #a function for creating a histogram of the distance between each ball and the container
-        distancefromcontainer = []
-        for i in range(1, self._N + 1):
-            distancefromcontainer.append(\
-                sp.sqrt(abs(sp.dot(self.balls[0].pos() - \
-                self.balls[i].pos(), (self.balls[0].pos() - \
-                self.balls[i].pos())))))
-        binslistcon = sp.arange(0.0, self.balls[0]._R + 0.5, 1.0)
+        plt = _pyplot()
+        self.synchronise()
+        separation = self._store.positions[1:] - self._store.positions[0]
+        distancefromcontainer = numpy.sqrt(numpy.einsum('ij,ij->i', \
+                                                        separation, separation))
+        binslistcon = numpy.arange(0.0, self.balls[0]._R + 0.5, 1.0)
         plt.hist(distancefromcontainer, bins=binslistcon)
         plt.title("Separation between balls and container")
         plt.xlabel("Distance between each balls and the container (m)")
@@ -155,16 +607,13 @@ class Simulation():
    
     def distance_between_balls(self):
         #a function for creating a histogram of the distance between each ball
-        distancebetweenballs = []
-        for i in range(1, self._N + 1):
-            for j in range(1, self._N + 1):
-                if i != j:
-                    distancebetweenballs.append(\
-                        sp.sqrt(abs(sp.dot((self.balls[i].pos() - \
-                        self.balls[j].pos()), (self.balls[i].pos() - \
-                        self.balls[j].pos())))))
-        binslistballs = sp.arange(0.0, 2*self.balls[0]._R + 0.5, 1.0)
-        plt.hist(distancebetweenballs, bins=binslistballs)
+        plt = _pyplot()
+        self.synchronise()
+        binslistballs = numpy.arange(0.0, 2*self.balls[0]._R + 0.5, 1.0)
+        #counting each pair both ways round, as for every ball the distance to every other ball
+        distancebetweenballs = 2*pair_distance_histogram(self._store.positions[1:], \
+                                                         binslistballs)
+        plt.hist(binslistballs[:-1], bins=binslistballs, weights=distancebetweenballs)
         plt.title("Separation between balls")
         plt.xlabel("Distance between each ball (m)")
         plt.ylabel("Number of balls that are this distance away")
@@ -174,21 +623,16 @@ class Simulation():
     def velocity_distribution(self, plotmaxboltz=False):
         #a function for creating a histogram of the speed of the molecules in the gas
         #and if plotmaxboltz==True comparing this to the Maxwell-Boltzman distribution
-        velocities = []
-        mass = []
-        pdf = []
+        plt = _pyplot()
         a = 3.5
         b = -3
-        for i in range(1, self._N + 1):
-            velocities.append(sp.sqrt(sp.dot(self.balls[i].vel(), \
-                self.balls[i].vel())))
-            mass.append(self.balls[i]._m)
-        maxwellboltzman = sp.linspace(0.0, max(velocities), len(velocities))
-        for i in range(0, len(velocities)):
-            pdf.append(a*(maxwellboltzman[i])*sp.exp(((\
-                       -0.5*mass[i]*(maxwellboltzman[i] + b)**2)/ \
-                       (1.38e-23*self._temperature[-1]))))
-        binslistvel = sp.arange(0.0, max(velocities), 1.5)
+        velocities = numpy.sqrt(numpy.einsum('ij,ij->i', self._store.velocities[1:], \
+                                             self._store.velocities[1:]))
+        mass = self._store.masses[1:]
+        maxwellboltzman = numpy.linspace(0.0, max(velocities), len(velocities))
+        pdf = a*maxwellboltzman*numpy.exp(((-0.5*mass*(maxwellboltzman + b)**2)/ \
+                                          (1.38e-23*self._temperature[-1])))
+        binslistvel = numpy.arange(0.0, max(velocities), 1.5)
         plt.hist(velocities, bins=binslistvel)
         if plotmaxboltz:
             plt.plot(maxwellboltzman, pdf, c='orange')
@@ -198,8 +642,25 @@ class Simulation():
         #plt.savefig("Fig.7.png") #a command to save the figure
         plt.show()
     
+    def radial_distribution(self, rdf=None): 
+        #a function for plotting the radial distribution function g(r) of the balls
+        #rdf is a RadialDistribution that was fed the simulation as an observer to average it 
+        #over the run, if not given g(r) is found from the current positions only
+        plt = _pyplot()
+        if rdf is None:
+            rdf = RadialDistribution(self._container._R, self._store.radii[1:].max())
+            rdf.sample(self._store.current_positions()[1:])
+        r, g = rdf.g()
+        plt.plot(r, g)
+        plt.axhline(1.0, c='black', ls='--')
+        plt.title("Radial distribution function of the balls")
+        plt.xlabel("Distance between balls (m)")
+        plt.ylabel("g(r)")
+        plt.show()
+    
     def kinetic_energy_conservation(self):
         # a function for ploting kinetic energy through time of the simulation
+        plt = _pyplot()
         zeropoint = [0.0]
         plt.plot(self._t_list, self._kinetic_energy_total)
         plt.scatter(zeropoint, zeropoint, color='white')
@@ -211,12 +672,11 @@ class Simulation():
         
     def momentum_conservation(self):
         # a function for ploting the components of momentum through time of the simulation
+        plt = _pyplot()
         zeropoint = [0.0]
-        xcomponent = []
-        ycomponent = []
-        for i in range(0, len(self._total_momentum)):
-            xcomponent.append(self._total_momentum[i][0])
-            ycomponent.append(self._total_momentum[i][1])
+        momentum = numpy.array(self._total_momentum).reshape(-1, 2)
+        xcomponent = momentum[:, 0]
+        ycomponent = momentum[:, 1]
         plt.plot(self._t_list, xcomponent, c='red', \
                  label='X-Component of Momentum')
         plt.plot(self._t_list, ycomponent, c='blue', \
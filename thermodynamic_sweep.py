@@ -0,0 +1,90 @@
+"""
+A module for running sweeps of simulations over a grid of parameters,
+each simulation in its own worker process
+"""
+
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from thermodynamic_simulation import Simulation
+
+def parameter_grid(**parameters):
+    #a function for creating the keyword arguments of Simulation for every combination of the given values
+    #e.g. parameter_grid(radius=[1, 1e-2], sigma=[1, 15, 20]) gives 6 sets of arguments
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in \
+            itertools.product(*[parameters[name] for name in names])]
+
+def run_case(case):
+    #a function for running one case of a sweep, this is what each worker process runs
+    #case is (keyword arguments of Simulation, number of collisions, seed, keep the time series,
+    #time to run until, time between samples, tolerance of the pressure), the time is used 
+    #instead of the collisions if given
+    parameters, num_frames, seed, keep_series, t_end, sample_interval, tol = case
+    sim = Simulation(seed=seed, **parameters)
+    result = dict(parameters)
+    if t_end is None:
+        sim.run(num_frames)
+    else:
+        samples = sim.run_until(t_end, sample_interval, tol)
+        result['wall_pressure'] = samples.stats.mean
+        result['wall_pressure_error'] = samples.stats.standard_error()
+    result['seed'] = seed
+    result.update(summarise(sim, keep_series))
+    return result
+
+def summarise(sim, keep_series=False):
+    #a function that returns the results of a simulation that has been run as a dictionary,
+    #the columns of a results table other than its parameters
+    #keep_series also gives the time series recorded at each collision as arrays
+    result = dict(pressure=sim.pressure(), pressure_error=sim.pressure_error(), \
+                  temperature=sim.temperature(), time=sim._t, collisions=sim._collision_count)
+    if keep_series:
+        result['t'] = numpy.array(sim._t_list)
+        result['kinetic_energy'] = numpy.array(sim._kinetic_energy_total)
+        result['temperature_series'] = numpy.array(sim._temperature)
+        result['momentum'] = numpy.array(sim._total_momentum).reshape(-1, 2)
+        #the pressure of each collision with the container and its time, as two series so
+        #both can be read a piece at a time from a results file
+        result['pressure_series'] = numpy.array(sim._pressure_evolution[0])
+        result['pressure_t'] = numpy.array(sim._pressure_evolution[1])
+    return result
+
+def sweep(grid, num_frames=None, seed=None, processes=None, keep_series=False, \
+          t_end=None, sample_interval=None, tol=None, mp_context=None):
+    #a function for running a simulation for each set of parameters in grid for num_frames collisions
+    #grid is a list of keyword arguments of Simulation, or a dictionary of lists of values
+    #which is expanded with parameter_grid
+    #t_end instead runs each simulation until that time, stopping early once the pressure on 
+    #the container over each sample_interval has a mean known to within tol of itself, which is 
+    #given in the wall_pressure and wall_pressure_error columns (see Simulation.run_until)
+    #every case gets its own seed drawn from seed, so a sweep with the same seed gives the same results
+    #processes is the number of worker processes, all of the cores if not given, 1 runs in this process
+    #mp_context is how the worker processes are started (a multiprocessing context or its name),
+    #by default 'fork' where the system has it, so the workers start as copies of this process and
+    #don't run the script that called sweep again; without fork (Windows) every worker imports 
+    #that script, so all of its work has to be under if __name__ == '__main__'
+    #returns the results table, a list with one row (dictionary) per case in the order of the grid
+    if (num_frames is None) == (t_end is None):
+        raise ValueError("give either num_frames or t_end")
+    if isinstance(grid, dict):
+        grid = parameter_grid(**grid)
+    seeds = [int(child.generate_state(1)[0]) for child in \
+             numpy.random.SeedSequence(seed).spawn(len(grid))]
+    cases = [(parameters, num_frames, case_seed, keep_series, t_end, sample_interval, tol) \
+             for parameters, case_seed in zip(grid, seeds)]
+    if processes == 1:
+        return [run_case(case) for case in cases]
+    if mp_context is None and 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = 'fork'
+    if isinstance(mp_context, str):
+        mp_context = multiprocessing.get_context(mp_context)
+    with ProcessPoolExecutor(processes, mp_context=mp_context) as pool:
+        return list(pool.map(run_case, cases))
+
+def column(results, name):
+    #a function that returns one column of a results table as an array
+    return numpy.array([row[name] for row in results])